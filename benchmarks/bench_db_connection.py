@@ -0,0 +1,59 @@
+"""
+对比每次查询新建连接（旧实现）与长连接（db.get_connection）的单次查询开销。
+
+用法：python benchmarks/bench_db_connection.py [记录数] [查询次数]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+import db
+
+
+def old_get_records(dbfile, node_id):
+    # 旧实现：每次查询 connect / close
+    conn = sqlite3.connect(dbfile)
+    c = conn.cursor()
+    c.execute("SELECT node_id, date, start, end FROM record WHERE 1=1 AND node_id=?", (node_id,))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    tmp = tempfile.mkdtemp()
+    db.DB_LEARN = os.path.join(tmp, 'data', 'learn.db')
+    db.DB_REVIEW = os.path.join(tmp, 'data', 'review.db')
+    db.init_db()
+    conn = db.get_connection(db.DB_LEARN)
+    with conn:
+        conn.executemany(
+            "INSERT INTO record (node_id, date, start, end) VALUES (?, ?, ?, ?)",
+            ((f"node-{i % 500}", "2024-01-01", i, i + 60) for i in range(n_records))
+        )
+    node_ids = [f"node-{i % 500}" for i in range(n_queries)]
+
+    t0 = time.perf_counter()
+    for node_id in node_ids:
+        old_get_records(db.DB_LEARN, node_id)
+    old_cost = (time.perf_counter() - t0) / n_queries
+
+    t0 = time.perf_counter()
+    for node_id in node_ids:
+        db.get_records(db.DB_LEARN, node_id)
+    new_cost = (time.perf_counter() - t0) / n_queries
+
+    db.close_all()
+    print(f"records={n_records} queries={n_queries}")
+    print(f"connect per query : {old_cost * 1e6:9.1f} us/query")
+    print(f"persistent conn   : {new_cost * 1e6:9.1f} us/query")
+    print(f"speedup           : {old_cost / new_cost:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
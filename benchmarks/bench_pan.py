@@ -0,0 +1,77 @@
+"""
+缩小状态下横向平移 5k 节点树状图的单帧绘制时间：关闭细节层次（阈值为 0，始终画文字、
+边框和抗锯齿连线）与默认阈值（纯色矩形 + 1 像素连线）对比。
+
+用法：python benchmarks/bench_pan.py [节点数] [帧数] [缩放比例]
+无显示环境时可设置 QT_QPA_PLATFORM=offscreen。
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from PyQt5.QtWidgets import QApplication, QGraphicsScene
+from PyQt5.QtGui import QPainter
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+import layout
+import tree_base
+import tree_model
+
+
+def random_tree(n_nodes, seed=0):
+    rng = random.Random(seed)
+    root = {"id": "root", "name": "Root", "children": []}
+    nodes = [root]
+    for i in range(n_nodes - 1):
+        node = {"id": f"n{i}", "name": f"Node {i}", "children": []}
+        rng.choice(nodes[-50:])["children"].append(node)
+        nodes.append(node)
+    return root
+
+
+def pan(root, n_frames, scale, lod_text_scale, lod_edge_scale):
+    scene = QGraphicsScene()
+    view = tree_base.ZoomableGraphicsView(scene, lod_text_scale=lod_text_scale, lod_edge_scale=lod_edge_scale)
+    view.setRenderHint(QPainter.Antialiasing)
+    view.resize(1280, 800)
+    sync = tree_base.SceneSync(scene)
+    # 与三个树状图相同的布局
+    lay = layout.TreeLayout(tree_model.TreeModel(root), 300, 120)
+    lay.build()
+    positions = lay.positions
+    sync.sync(root, positions, lambda node: ("#A0A0A0", f'{node["name"]}\n1h 2m 3s'))
+    view.scale(scale, scale)
+    view.show()
+    app.processEvents()
+
+    rect = scene.itemsBoundingRect()
+    y = rect.center().y()
+    costs = []
+    for i in range(n_frames):
+        x = rect.left() + rect.width() * i / max(1, n_frames - 1)
+        view.centerOn(x, y)
+        t0 = time.perf_counter()
+        view.viewport().repaint()
+        costs.append(time.perf_counter() - t0)
+    view.close()
+    costs.sort()
+    return sum(costs) / len(costs), costs[int(len(costs) * 0.95) - 1]
+
+
+def main():
+    n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    scale = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    root = random_tree(n_nodes)
+    full_avg, full_p95 = pan(root, n_frames, scale, 0.0, 0.0)
+    lod_avg, lod_p95 = pan(root, n_frames, scale, tree_base.LOD_TEXT_SCALE, tree_base.LOD_EDGE_SCALE)
+    print(f"nodes={n_nodes} frames={n_frames} scale={scale}")
+    print(f"full detail : avg {full_avg * 1e3:7.2f} ms  p95 {full_p95 * 1e3:7.2f} ms")
+    print(f"LOD         : avg {lod_avg * 1e3:7.2f} ms  p95 {lod_p95 * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+对比 5k 节点树状图的场景构建时间：旧 NodeItem（每个节点两个 QGraphicsTextItem，
+一个只用于测量）与新 NodeItem（QFontMetricsF 测量缓存 + paint 中绘制文字）。
+
+用法：python benchmarks/bench_scene_build.py [节点数] [重复次数]
+无显示环境时可设置 QT_QPA_PLATFORM=offscreen。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsRectItem, QGraphicsTextItem
+from PyQt5.QtGui import QBrush, QColor, QPen, QFont
+from PyQt5.QtCore import Qt
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+import tree_base
+
+
+class OldNodeItem(QGraphicsRectItem):
+    # 旧实现：临时 QGraphicsTextItem 测量 + 子 QGraphicsTextItem 显示
+    PADDING = 16
+
+    def __init__(self, node_data, color, text, pos=(0, 0)):
+        x, y = pos
+        font = QFont("霞鹜文楷")
+        font.setPointSize(10)
+        font.setBold(True)
+        temp_text = QGraphicsTextItem(text)
+        temp_text.setFont(font)
+        rect = temp_text.boundingRect()
+        width = rect.width() + self.PADDING
+        height = rect.height() + self.PADDING
+        super().__init__(-width/2, -height/2, width, height)
+        self.setPos(x, y)
+        self.setBrush(QBrush(QColor(color)))
+        self.setPen(QPen(Qt.black, 2))
+        self.node_data = node_data
+        self.text = QGraphicsTextItem(text, self)
+        self.text.setFont(font)
+        text_rect = self.text.boundingRect()
+        self.text.setPos(-text_rect.width() / 2, -text_rect.height() / 2)
+
+
+def build(item_cls, labels):
+    scene = QGraphicsScene()
+    t0 = time.perf_counter()
+    for i, text in enumerate(labels):
+        scene.addItem(item_cls({"id": str(i)}, "#A0A0A0", text, ((i % 100) * 300, (i // 100) * 120)))
+    cost = time.perf_counter() - t0
+    scene.clear()
+    return cost
+
+
+def main():
+    n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    # 与视图中相近的标签：名称 + 时长，部分重复（同一刷新中多个节点时长相同）
+    labels = [f"Node {i}\n{i % 7}h {i % 60}m 0s" for i in range(n_nodes)]
+    old_cost = min(build(OldNodeItem, labels) for _ in range(repeat))
+    new_cost = min(build(tree_base.NodeItem, labels) for _ in range(repeat))
+    print(f"nodes={n_nodes}")
+    print(f"QGraphicsTextItem x2 : {old_cost * 1e3:9.1f} ms")
+    print(f"cached metrics/paint : {new_cost * 1e3:9.1f} ms")
+    print(f"speedup              : {old_cost / new_cost:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
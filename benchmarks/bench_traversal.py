@@ -0,0 +1,98 @@
+"""
+对比递归遍历（旧实现）与 traversal 模块迭代遍历在极深、极宽两种树上的开销。
+
+深树为一条链，旧的递归实现会触发 RecursionError；collect_ids 的逐层列表拼接为平方复杂度。
+
+用法：python benchmarks/bench_traversal.py [深度] [宽度]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+import layout
+import traversal
+import tree_model
+
+
+def old_collect_ids(node):
+    # 旧实现（stats.collect_ids）
+    ids = [node.get("id")]
+    for ch in node.get("children", []):
+        ids.extend(old_collect_ids(ch))
+    return ids
+
+
+def old_layout(root, x_offset, y_offset):
+    # 旧实现（assign_leaf_positions + set_positions）
+    leaf_positions = []
+    def assign_leaf_positions(node, depth=0):
+        if not node.get("children"):
+            node["_leaf_index"] = len(leaf_positions)
+            leaf_positions.append(node)
+        else:
+            for ch in node["children"]:
+                assign_leaf_positions(ch, depth+1)
+
+    def set_positions(node, depth=0):
+        y = depth * y_offset
+        if not node.get("children"):
+            x = node["_leaf_index"] * x_offset
+            node["pos"] = [x, y]
+            return x
+        else:
+            child_xs = [set_positions(ch, depth+1) for ch in node["children"]]
+            x = sum(child_xs) / len(child_xs)
+            node["pos"] = [x, y]
+            return x
+
+    assign_leaf_positions(root)
+    set_positions(root)
+
+
+def tree_layout(model, x_offset, y_offset):
+    # 三个树状图使用的布局（全量构建）
+    layout.TreeLayout(model, x_offset, y_offset).build()
+
+
+def deep_tree(depth):
+    root = {"id": "n0", "children": []}
+    node = root
+    for i in range(1, depth):
+        child = {"id": f"n{i}", "children": []}
+        node["children"].append(child)
+        node = child
+    return root
+
+
+def wide_tree(width):
+    return {"id": "root", "children": [{"id": f"n{i}", "children": []} for i in range(width)]}
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    try:
+        func(*args)
+    except RecursionError:
+        return None
+    return time.perf_counter() - t0
+
+
+def fmt(cost):
+    return "RecursionError" if cost is None else f"{cost * 1e3:9.1f} ms"
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    for name, root in ((f"deep ({depth})", deep_tree(depth)), (f"wide ({width})", wide_tree(width))):
+        print(name)
+        print(f"  collect_ids (recursive)   : {fmt(timed(old_collect_ids, root))}")
+        print(f"  subtree_ids (iterative)   : {fmt(timed(traversal.subtree_ids, root))}")
+        print(f"  layout (recursive)        : {fmt(timed(old_layout, root, 300, 120))}")
+        model = tree_model.TreeModel(root)
+        print(f"  TreeLayout.build          : {fmt(timed(tree_layout, model, 300, 120))}")
+
+
+if __name__ == "__main__":
+    main()
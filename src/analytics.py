@@ -0,0 +1,42 @@
+"""
+基于 NumPy 的时长统计。
+
+节点按树的先序遍历编号为稠密整数，节点 i 的子树正好是 [i, subtree_end[i])
+这一连续区间；按日、月的汇总都用 bincount 向量化完成，不在 Python 中逐条循环。
+数据由 db.load_daily_arrays 载入。
+"""
+import numpy as np
+import traversal
+
+# 与 db 载入函数中的 kind 编号一致
+LEARN = 0
+REVIEW = 1
+
+def index_tree(root):
+    """先序编号。返回 (ids, index, subtree_end)，index 为 {node_id: 编号}。"""
+    ids = []
+    ends = []
+    open_nodes = []   # [(深度, 编号)]，子树尚未结束的祖先
+    for node, _, depth in traversal.preorder(root):
+        # 遇到不深于它们的节点时，这些子树已经全部编号，回填区间终点
+        while open_nodes and open_nodes[-1][0] >= depth:
+            ends[open_nodes.pop()[1]] = len(ids)
+        open_nodes.append((depth, len(ids)))
+        ids.append(node.get("id"))
+        ends.append(0)
+    for _, pos in open_nodes:
+        ends[pos] = len(ids)
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    return ids, index, np.array(ends, dtype=np.int64)
+
+def per_day_seconds(day, seconds, first_day, n_days):
+    """[first_day, first_day + n_days) 内每天的时长。"""
+    offset = day - first_day
+    mask = (offset >= 0) & (offset < n_days)
+    return np.bincount(offset[mask], weights=seconds[mask], minlength=n_days)
+
+def per_month_seconds(day, seconds, month_starts):
+    """month_starts 为各月第一天的整数日序号（升序），返回每月时长。"""
+    idx = np.searchsorted(month_starts, day, side="right") - 1
+    mask = idx >= 0
+    return np.bincount(idx[mask], weights=seconds[mask], minlength=len(month_starts))
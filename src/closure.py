@@ -0,0 +1,128 @@
+"""
+项目树的闭包表：closure(ancestor, descendant, depth)。
+
+树本身保存在 data.json（或 node_store）中，闭包表作为 TEMP 表建在每个存放 daily
+汇总表的数据库连接上（见 db.daily_sources），首次使用时由整棵树生成，之后随共享树
+模型的增、删、移动增量维护。"每个节点子树在某个日期窗口内的学习/复习总时长"
+因此是一次 JOIN + GROUP BY，不需要在 Python 中收集子树 id。
+"""
+import json
+import db
+import traversal
+import tree_model
+
+def _create(conn):
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS closure (
+            ancestor TEXT NOT NULL,
+            descendant TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor, descendant)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS temp.idx_closure_descendant ON closure (descendant, ancestor)")
+
+def closure_rows(node):
+    """node 子树内部的闭包行 (ancestor, descendant, depth)，含自身深度为 0 的行。"""
+    rows = []
+    path = []   # 从 node 到当前节点的 id 路径，先序遍历中按深度截断
+    for n, _, depth in traversal.preorder(node):
+        del path[depth:]
+        path.append(n["id"])
+        for i, ancestor in enumerate(path):
+            rows.append((ancestor, n["id"], depth - i))
+    return rows
+
+# 把 ? 子树挂到 ? 的所有祖先（含其自身）下
+_LINK_SQL = """
+    INSERT OR REPLACE INTO closure (ancestor, descendant, depth)
+    SELECT a.ancestor, s.descendant, a.depth + s.depth + 1
+    FROM closure a JOIN closure s ON s.ancestor = ?
+    WHERE a.descendant = ?
+"""
+_DELETE_SUBTREE_SQL = """
+    DELETE FROM closure WHERE descendant IN (SELECT descendant FROM closure WHERE ancestor = ?)
+"""
+# 断开子树与外部祖先的联系，保留子树内部的行
+_UNLINK_SQL = """
+    DELETE FROM closure
+    WHERE descendant IN (SELECT descendant FROM closure WHERE ancestor = ?)
+      AND ancestor NOT IN (SELECT descendant FROM closure WHERE ancestor = ?)
+"""
+
+_root_id = None
+_built = set()   # 已建立闭包表的数据库文件
+
+def _paths():
+    return [path for path, _ in db.daily_sources()]
+
+def ensure(root):
+    """首次使用或换了根节点 / 数据库时，由整棵树重建闭包表。"""
+    global _root_id
+    paths = _paths()
+    if _root_id == root.get("id") and _built.issuperset(paths):
+        return
+    rows = closure_rows(root)
+    for path in paths:
+        conn = db.get_connection(path)
+        with db._lock, conn:
+            _create(conn)
+            conn.execute("DELETE FROM closure")
+            conn.executemany("INSERT INTO closure (ancestor, descendant, depth) VALUES (?, ?, ?)", rows)
+    _built.clear()
+    _built.update(paths)
+    _root_id = root.get("id")
+
+def _on_tree_changed(op, node):
+    # 与 rollup 一样同步共享树模型上的结构编辑，只在闭包表已建立时维护
+    kind = op["op"]
+    for path in _built:
+        if kind == "add":
+            db.execute_many(path, "INSERT OR REPLACE INTO closure (ancestor, descendant, depth) VALUES (?, ?, ?)",
+                            closure_rows(node))
+            db.execute(path, _LINK_SQL, (node["id"], op["parent"]))
+        elif kind == "remove":
+            db.execute(path, _DELETE_SUBTREE_SQL, (node["id"],))
+        elif kind == "move":
+            db.execute(path, _UNLINK_SQL, (node["id"], node["id"]))
+            db.execute(path, _LINK_SQL, (node["id"], op["parent"]))
+
+tree_model.add_listener(_on_tree_changed)
+
+def subtree_seconds(root, ancestors=None, since_days=(None,), kinds=db.KINDS):
+    """每个节点子树的时长，一次 JOIN + GROUP BY（统一存储下学习/复习也在同一次查询中）。
+
+    ancestors 为要汇总的节点 id（None 为全部节点）；since_days 为若干窗口起始的整数日序号
+    （None 表示不限），每个窗口一列。返回 {kind: {node_id: [各窗口秒数]}}。
+    """
+    ensure(root)
+    totals = {kind: {} for kind in kinds}
+    starts = [day for day in since_days if day is not None]
+    for path, kind in db.daily_sources(kinds):
+        params = []
+        columns = []
+        for day in since_days:
+            if day is None:
+                columns.append("SUM(d.seconds)")
+            else:
+                columns.append("SUM(CASE WHEN d.day>=? THEN d.seconds ELSE 0 END)")
+                params.append(int(day))
+        if kind is None:
+            sql = f"SELECT d.kind, c.ancestor, {', '.join(columns)}"
+        else:
+            sql = f"SELECT ?, c.ancestor, {', '.join(columns)}"
+            params.insert(0, kind)
+        sql += " FROM closure c JOIN daily d ON d.node_id = c.descendant WHERE 1=1"
+        if kind is None:
+            sql += " AND d.kind IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(kinds)))
+        if ancestors is not None:
+            sql += " AND c.ancestor IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(ancestors)))
+        if len(starts) == len(since_days):
+            sql += " AND d.day>=?"
+            params.append(int(min(starts)))
+        sql += " GROUP BY c.ancestor" + (", d.kind" if kind is None else "")
+        for k, node_id, *seconds in db.query(path, sql, params):
+            totals[k][node_id] = [s or 0 for s in seconds]
+    return totals
@@ -0,0 +1,46 @@
+"""
+树状图的折叠状态，每个视图各自一份，保存在 data/collapsed.json：{视图名: [node_id]}。
+
+折叠的节点在布局中只占一个叶子位置，子树不创建图元，只在节点上显示汇总徽标
+（见 layout、tree_base.SceneSync）。不写入 data.json，切换树存储后端不受影响。
+"""
+import json
+import os
+import tree_model
+from persistence import atomic_write
+
+COLLAPSE_FILE = os.path.join(tree_model.get_base_dir(), "data", "collapsed.json")
+
+def _load_all():
+    try:
+        with open(COLLAPSE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+class CollapseState:
+    def __init__(self, view):
+        self.view = view
+        self.ids = set(_load_all().get(view, []))   # 布局持有同一个集合
+
+    def toggle(self, node_id):
+        if node_id in self.ids:
+            self.ids.discard(node_id)
+        else:
+            self.ids.add(node_id)
+        self.save()
+
+    def save(self):
+        # 顺带去掉已删除的节点；其他视图的状态原样保留
+        self.ids.intersection_update(tree_model.get_model().by_id)
+        data = _load_all()
+        data[self.view] = sorted(self.ids)
+        atomic_write(COLLAPSE_FILE, json.dumps(data, ensure_ascii=False, indent=2))
+
+_states = {}
+
+def get_state(view):
+    state = _states.get(view)
+    if state is None:
+        state = _states[view] = CollapseState(view)
+    return state
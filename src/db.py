@@ -1,6 +1,10 @@
-
 import sqlite3
+import datetime
+import json
 import os
+import queue
+import threading
+import traversal
 
 def get_base_dir():
     import sys
@@ -11,54 +15,509 @@ def get_base_dir():
 
 DB_LEARN = os.path.join(get_base_dir(), 'data', 'learn.db')
 DB_REVIEW = os.path.join(get_base_dir(), 'data', 'review.db')
+# 可选的统一存储：学习/复习记录放在同一个 session 表中，用 kind 列区分
+DB_SESSIONS = os.path.join(get_base_dir(), 'data', 'sessions.db')
+KINDS = ("learn", "review")
+
+_unified = False
+
+# 每个数据库文件一个长连接，避免每次查询都重新 connect
+_connections = {}
+_lock = threading.RLock()
+
+def get_connection(dbfile):
+    """返回 dbfile 对应的长连接，首次使用时创建并设置 pragma。"""
+    with _lock:
+        conn = _connections.get(dbfile)
+        if conn is None:
+            conn = sqlite3.connect(dbfile, check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-16000")  # 约 16MB 页缓存
+            conn.execute("PRAGMA mmap_size=268435456")  # 256MB 内存映射
+            conn.execute("PRAGMA temp_store=MEMORY")
+            _connections[dbfile] = conn
+        return conn
+
+def close_all():
+    """等待后台写入完成并关闭所有长连接（程序退出时调用）。"""
+    writer.stop()
+    with _lock:
+        for conn in _connections.values():
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            conn.close()
+        _connections.clear()
+
+class BackgroundWriter:
+    """单线程后台写入队列：按提交顺序执行写操作，GUI 线程不等待磁盘 I/O。
+
+    callback(error) 在写入线程中调用，error 为 None 表示成功。
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def submit(self, func, *args, callback=None):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+        self._queue.put((func, args, callback))
+
+    def stop(self):
+        # 处理完队列中剩余的任务后退出
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            func, args, callback = item
+            error = None
+            try:
+                func(*args)
+            except Exception as e:
+                error = e
+            if callback is not None:
+                callback(error)
+
+writer = BackgroundWriter()
+
+def query(dbfile, sql, params=()):
+    conn = get_connection(dbfile)
+    with _lock:
+        return conn.execute(sql, params).fetchall()
+
+def execute_many(dbfile, sql, rows):
+    """在一个事务中执行写语句，供 db 之外的表（如 node_store）使用。"""
+    execute_batch(dbfile, [(sql, rows)])
+
+def execute_batch(dbfile, statements):
+    """在一个事务中依次执行 [(sql, rows)]。"""
+    conn = get_connection(dbfile)
+    with _lock, conn:
+        for sql, rows in statements:
+            conn.executemany(sql, rows)
 
-def init_db():
+def execute(dbfile, sql, params=()):
+    execute_many(dbfile, sql, [params])
+
+# ---- 表结构版本迁移 ----
+# 版本号记录在 PRAGMA user_version 中，启动时按顺序补齐缺少的迁移步骤
+
+def _migrate_v1(conn):
+    # 初始表结构（旧版本数据库已存在该表）
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS record (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id TEXT,
+            date TEXT,
+            start INTEGER,
+            end INTEGER
+        )
+    """)
+
+def _migrate_v2(conn):
+    # 覆盖索引：按节点 / 按日期汇总时无需回表
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_record_node_start ON record (node_id, start, end)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_record_date ON record (date, node_id, start, end)")
+
+def _migrate_v3(conn):
+    # 按 (节点, 日期) 预汇总的时长表，图表查询只需扫描几百行
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily (
+            node_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (node_id, day)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_day ON daily (day, node_id, seconds)")
+    conn.execute("""
+        INSERT OR REPLACE INTO daily (node_id, day, seconds)
+        SELECT node_id, date, SUM(end - start) FROM record GROUP BY node_id, date
+    """)
+
+def _migrate_v4(conn):
+    # 整数日序号（1970-01-01 起的天数）替代 TEXT 日期匹配，daily 表同样改用整数日
+    conn.execute("ALTER TABLE record ADD COLUMN day INTEGER")
+    conn.execute("UPDATE record SET day = CAST(julianday(date) - julianday('1970-01-01') AS INTEGER)")
+    conn.execute("DROP INDEX IF EXISTS idx_record_date")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_record_day ON record (day, node_id, start, end)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_record_start ON record (start, end, node_id)")
+    conn.execute("""
+        CREATE TABLE daily_new (
+            node_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (node_id, day)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO daily_new (node_id, day, seconds)
+        SELECT node_id, CAST(julianday(day) - julianday('1970-01-01') AS INTEGER), seconds FROM daily
+    """)
+    conn.execute("DROP TABLE daily")
+    conn.execute("ALTER TABLE daily_new RENAME TO daily")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_day ON daily (day, node_id, seconds)")
+
+_MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3, _migrate_v4]
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+def _session_v1(conn):
+    # 统一存储的表结构：与 record / daily 相同，另加 kind 列
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS session (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            node_id TEXT,
+            date TEXT,
+            day INTEGER,
+            start INTEGER,
+            end INTEGER
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_session_node_start ON session (node_id, start, end, kind)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_session_day ON session (day, node_id, start, end, kind)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_session_start ON session (start, end, node_id, kind)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily (
+            kind TEXT NOT NULL,
+            node_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (node_id, day, kind)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_day ON daily (day, node_id, kind, seconds)")
+
+_SESSION_MIGRATIONS = [_session_v1]
+
+def migrate(conn, migrations=_MIGRATIONS):
+    """把数据库升级到 len(migrations) 版本，每一步在单独事务中执行。"""
+    with _lock:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, len(migrations) + 1):
+            conn.execute("BEGIN")
+            try:
+                migrations[target - 1](conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+def init_db(unified=False):
+    """初始化 / 升级数据库。unified 为 True 时启用统一存储。
+
+    每次启动时按开关方向补齐两种存储之间缺少的记录：启用时把 learn.db / review.db 中
+    sessions.db 还没有的记录导入（首次启用即全部历史），停用时把 sessions.db 中
+    旧库还没有的记录写回，切换开关不会让任何一边的记录消失。
+    """
+    global _unified
     data_dir = os.path.dirname(DB_LEARN)
     if not os.path.exists(data_dir):
         os.makedirs(data_dir, exist_ok=True)
     for dbfile in [DB_LEARN, DB_REVIEW]:
-        if not os.path.exists(dbfile):
-            conn = sqlite3.connect(dbfile)
-            c = conn.cursor()
-            c.execute("""
-                CREATE TABLE record (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    node_id TEXT,
-                    date TEXT,
-                    start INTEGER,
-                    end INTEGER
-                )
-            """)
-            conn.commit()
-            conn.close()
+        migrate(get_connection(dbfile))
+    if unified:
+        conn = get_connection(DB_SESSIONS)
+        migrate(conn, _SESSION_MIGRATIONS)
+        _import_split_files(conn)
+    elif os.path.exists(DB_SESSIONS):
+        _export_to_split_files()
+    _unified = unified
+
+# 两种存储只会在开关的不同时段各自写入，缺少的记录都晚于目标库中同类最新一条，
+# 按 start 比较即可找出（走 start 索引）
+
+def _import_split_files(conn):
+    # 把 learn.db / review.db 中开始时间晚于 session 表同 kind 最新记录的行导入，
+    # 并累加到 daily 汇总；旧文件保持不变
+    with _lock:
+        conn.execute("ATTACH DATABASE ? AS src_learn", (DB_LEARN,))
+        conn.execute("ATTACH DATABASE ? AS src_review", (DB_REVIEW,))
+        try:
+            with conn:
+                for kind, schema in (("learn", "src_learn"), ("review", "src_review")):
+                    since = conn.execute("SELECT MAX(start) FROM session WHERE kind=?", (kind,)).fetchone()[0]
+                    since = -1 if since is None else since
+                    conn.execute(
+                        f"INSERT INTO session (kind, node_id, date, day, start, end)"
+                        f" SELECT ?, node_id, date, day, start, end FROM {schema}.record WHERE start>? ORDER BY id",
+                        (kind, since)
+                    )
+                    conn.execute(
+                        f"INSERT INTO daily (kind, node_id, day, seconds)"
+                        f" SELECT ?, node_id, day, SUM(end - start) FROM {schema}.record WHERE start>?"
+                        f" GROUP BY node_id, day"
+                        f" ON CONFLICT (node_id, day, kind) DO UPDATE SET seconds = seconds + excluded.seconds",
+                        (kind, since)
+                    )
+        finally:
+            conn.execute("DETACH DATABASE src_learn")
+            conn.execute("DETACH DATABASE src_review")
+
+def _export_to_split_files():
+    # 停用统一存储后：把 session 表中开始时间晚于旧库最新记录的行写回 learn.db / review.db
+    for kind in KINDS:
+        conn = get_connection(_kind_file(kind))
+        with _lock:
+            conn.execute("ATTACH DATABASE ? AS src_sessions", (DB_SESSIONS,))
+            try:
+                has_table = conn.execute(
+                    "SELECT 1 FROM src_sessions.sqlite_master WHERE type='table' AND name='session'"
+                ).fetchone()
+                if not has_table:
+                    continue
+                with conn:
+                    since = conn.execute("SELECT MAX(start) FROM record").fetchone()[0]
+                    since = -1 if since is None else since
+                    conn.execute(
+                        "INSERT INTO record (node_id, date, day, start, end)"
+                        " SELECT node_id, date, day, start, end FROM src_sessions.session"
+                        " WHERE kind=? AND start>? ORDER BY id",
+                        (kind, since)
+                    )
+                    conn.execute(
+                        "INSERT INTO daily (node_id, day, seconds)"
+                        " SELECT node_id, day, SUM(end - start) FROM src_sessions.session"
+                        " WHERE kind=? AND start>? GROUP BY node_id, day"
+                        " ON CONFLICT (node_id, day) DO UPDATE SET seconds = seconds + excluded.seconds",
+                        (kind, since)
+                    )
+            finally:
+                conn.execute("DETACH DATABASE src_sessions")
+
+def _source(dbfile):
+    """兼容层：统一存储启用时把 DB_LEARN / DB_REVIEW 映射到 sessions.db 中对应 kind 的行。
+
+    返回 (实际数据库文件, 记录表名, kind)，未启用时 kind 为 None。
+    """
+    if _unified:
+        if dbfile == DB_LEARN:
+            return DB_SESSIONS, "session", "learn"
+        if dbfile == DB_REVIEW:
+            return DB_SESSIONS, "session", "review"
+    return dbfile, "record", None
+
+def _kind_file(kind):
+    return DB_LEARN if kind == "learn" else DB_REVIEW
+
+def _kind_filter(kinds, params):
+    # 统一存储中按 kind 过滤；kinds 为 None 表示不过滤
+    if kinds is None:
+        return ""
+    kinds = list(kinds)
+    if len(kinds) == 1:
+        params.append(kinds[0])
+        return " AND kind=?"
+    params.extend(kinds)
+    return f" AND kind IN ({', '.join('?' * len(kinds))})"
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+
+def date_to_day(date):
+    """"%Y-%m-%d" 字符串或 date 转为整数日序号。"""
+    if isinstance(date, str):
+        date = datetime.datetime.strptime(date, "%Y-%m-%d").date()
+    return (date - EPOCH_DATE).days
 
 def add_record(dbfile, node_id, date, start, end):
-    conn = sqlite3.connect(dbfile)
-    c = conn.cursor()
-    c.execute("INSERT INTO record (node_id, date, start, end) VALUES (?, ?, ?, ?)", (node_id, date, start, end))
-    conn.commit()
-    conn.close()
+    add_records(dbfile, [(node_id, date, start, end)])
 
-def get_records(dbfile, node_id=None, date=None):
-    conn = sqlite3.connect(dbfile)
-    c = conn.cursor()
-    sql = "SELECT node_id, date, start, end FROM record WHERE 1=1"
+def add_records(dbfile, rows):
+    """在一个事务中批量写入多条 (node_id, date, start, end) 记录。"""
+    rows = list(rows)
+    days = {date: date_to_day(date) for date in {row[1] for row in rows}}
+    daily = {}
+    for node_id, date, start, end in rows:
+        key = (node_id, days[date])
+        daily[key] = daily.get(key, 0) + end - start
+    path, table, kind = _source(dbfile)
+    conn = get_connection(path)
+    with _lock, conn:
+        if kind is None:
+            conn.executemany(
+                "INSERT INTO record (node_id, date, day, start, end) VALUES (?, ?, ?, ?, ?)",
+                [(node_id, date, days[date], start, end) for node_id, date, start, end in rows]
+            )
+            # 同一事务内维护 daily 汇总表
+            conn.executemany(
+                "INSERT INTO daily (node_id, day, seconds) VALUES (?, ?, ?)"
+                " ON CONFLICT (node_id, day) DO UPDATE SET seconds = seconds + excluded.seconds",
+                [(node_id, day, seconds) for (node_id, day), seconds in daily.items()]
+            )
+        else:
+            conn.executemany(
+                "INSERT INTO session (kind, node_id, date, day, start, end) VALUES (?, ?, ?, ?, ?, ?)",
+                [(kind, node_id, date, days[date], start, end) for node_id, date, start, end in rows]
+            )
+            conn.executemany(
+                "INSERT INTO daily (kind, node_id, day, seconds) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (node_id, day, kind) DO UPDATE SET seconds = seconds + excluded.seconds",
+                [(kind, node_id, day, seconds) for (node_id, day), seconds in daily.items()]
+            )
+    for listener in _insert_listeners:
+        listener(dbfile, rows)
+
+# 写入成功后的回调 listener(dbfile, rows)，用于维护增量缓存
+_insert_listeners = []
+
+def add_insert_listener(listener):
+    _insert_listeners.append(listener)
+
+RECORD_COLUMNS = ("node_id", "date", "day", "start", "end")
+DEFAULT_COLUMNS = ("node_id", "date", "start", "end")
+
+def _record_sql(table, columns, node_id=None, node_ids=None, date=None, start=None, end=None):
+    for col in columns:
+        if col not in RECORD_COLUMNS + ("kind",):
+            raise ValueError(f"unknown record column: {col}")
+    sql = f"SELECT {', '.join(columns)} FROM {table} WHERE 1=1"
     params = []
     if node_id:
         sql += " AND node_id=?"
         params.append(node_id)
+    if node_ids is not None:
+        sql += " AND node_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(node_ids)))
     if date:
-        sql += " AND date=?"
-        params.append(date)
-    c.execute(sql, params)
-    rows = c.fetchall()
-    conn.close()
-    return rows
+        sql += " AND day=?"
+        params.append(date_to_day(date))
+    if start is not None:
+        sql += " AND start>=?"
+        params.append(int(start))
+    if end is not None:
+        sql += " AND start<?"
+        params.append(int(end))
+    return sql, params
+
+def _stream(path, sql, params, chunk_size):
+    conn = get_connection(path)
+    with _lock:
+        cursor = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+def iter_records(dbfile, columns=DEFAULT_COLUMNS, node_id=None, node_ids=None, date=None,
+                 start=None, end=None, chunk_size=1000):
+    """按 fetchmany 分块读取记录的生成器，不一次性载入全部历史。
+
+    columns 为要读取的列（RECORD_COLUMNS 的子集），按顺序返回元组；
+    node_id / date 为单值过滤，node_ids 为节点集合，start / end 为 epoch 秒，
+    取开始时间落在 [start, end) 内的记录。
+    迭代期间持有数据库锁，后台写入会等到迭代结束，调用方应尽快消费。
+    """
+    path, table, kind = _source(dbfile)
+    sql, params = _record_sql(table, columns, node_id, node_ids, date, start, end)
+    if kind is not None:
+        sql += _kind_filter([kind], params)
+    return _stream(path, sql, params, chunk_size)
+
+def iter_sessions(columns=DEFAULT_COLUMNS, kinds=KINDS, chunk_size=1000, **filters):
+    """同时读取学习和复习记录，每行为 (kind,) + columns，过滤参数同 iter_records。
+
+    统一存储下只做一次索引扫描，否则依次读取两个库。
+    """
+    if _unified:
+        sql, params = _record_sql("session", ("kind",) + tuple(columns), **filters)
+        sql += _kind_filter(kinds, params)
+        yield from _stream(DB_SESSIONS, sql, params, chunk_size)
+        return
+    for kind in kinds:
+        for row in iter_records(_kind_file(kind), columns, chunk_size=chunk_size, **filters):
+            yield (kind,) + row
+
+def get_records(dbfile, node_id=None, date=None):
+    return list(iter_records(dbfile, node_id=node_id, date=date))
 
 def get_all_records(dbfile):
-    conn = sqlite3.connect(dbfile)
-    c = conn.cursor()
-    c.execute("SELECT node_id, date, start, end FROM record")
-    rows = c.fetchall()
-    conn.close()
-    return rows
\ No newline at end of file
+    return list(iter_records(dbfile))
+
+def daily_sources(kinds=KINDS):
+    """daily 表所在的 (数据库文件, kind) 列表；统一存储下只有 sessions.db，kind 为 None（表中有 kind 列）。"""
+    if _unified:
+        return [(DB_SESSIONS, None)]
+    return [(_kind_file(kind), kind) for kind in kinds]
+
+def _daily_rows(columns, node_ids=None, first_day=None, kinds=KINDS, group_by=None):
+    # 合并查询学习/复习的 daily 汇总表，每行为 (kind,) + columns
+    rows = []
+    for path, kind in daily_sources(kinds):
+        params = []
+        if kind is None:
+            sql = f"SELECT kind, {', '.join(columns)} FROM daily WHERE 1=1"
+            sql += _kind_filter(kinds, params)
+        else:
+            sql = f"SELECT ?, {', '.join(columns)} FROM daily WHERE 1=1"
+            params.append(kind)
+        if node_ids is not None:
+            sql += " AND node_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(node_ids)))
+        if first_day is not None:
+            sql += " AND day>=?"
+            params.append(int(first_day))
+        if group_by:
+            sql += f" GROUP BY {'kind, ' if kind is None else ''}{group_by}"
+        rows.extend(query(path, sql, params))
+    return rows
+
+def load_daily_arrays(node_index, first_day=None):
+    """把 daily 汇总表读成 NumPy 列数组 {"node", "day", "seconds", "kind"}。
+
+    node_index 为 {node_id: 稠密编号}（见 analytics.index_tree），不在其中的记录被丢弃；
+    first_day 为整数日序号下限。kind 为 KINDS 中的下标（0 为学习、1 为复习）。
+    """
+    import numpy as np
+    dtype = [("kind", np.int8), ("node", np.int64), ("day", np.int64), ("seconds", np.int64)]
+    rows = _daily_rows(("node_id", "day", "seconds"), node_ids=node_index, first_day=first_day)
+    kind_index = {kind: i for i, kind in enumerate(KINDS)}
+    arr = np.fromiter(((kind_index[k], node_index[n], d, s) for k, n, d, s in rows), dtype=dtype, count=len(rows))
+    return {"node": arr["node"], "day": arr["day"], "seconds": arr["seconds"], "kind": arr["kind"]}
+
+def sum_seconds_by_node(dbfile, start_date=None, end_date=None):
+    """按 node_id 汇总时长（秒），一次 GROUP BY 查询。
+
+    start_date / end_date 为 "%Y-%m-%d" 字符串，闭区间，可省略。
+    返回 {node_id: seconds}。
+    """
+    path, _, kind = _source(dbfile)
+    params = []
+    sql = "SELECT node_id, SUM(seconds) FROM daily WHERE 1=1"
+    if kind is not None:
+        sql += _kind_filter([kind], params)
+    if start_date:
+        sql += " AND day>=?"
+        params.append(date_to_day(start_date))
+    if end_date:
+        sql += " AND day<=?"
+        params.append(date_to_day(end_date))
+    sql += " GROUP BY node_id"
+    rows = query(path, sql, params)
+    return {node_id: total or 0 for node_id, total in rows}
+
+def rollup_subtree_totals(root, per_node):
+    """把每个节点自身的时长累加到所有祖先上，单次后序遍历。
+
+    per_node 为 sum_seconds_by_node 的结果，返回 {node_id: 子树总时长}。
+    """
+    totals = {}
+    for node, _, _ in traversal.postorder(root):
+        total = per_node.get(node.get("id"), 0)
+        for ch in node.get("children", []):
+            total += totals.get(ch.get("id"), 0)
+        totals[node.get("id")] = total
+    return totals
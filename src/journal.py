@@ -0,0 +1,115 @@
+"""
+项目树的追加式编辑日志（可选存储后端）。
+
+每次修改把树操作（与 TreeModel.apply 的 op 相同）作为一行 JSON 追加到
+data/data.journal，单次编辑的写入量与树的大小无关。累计 COMPACT_EVERY 条或退出时
+压缩：把整棵树原子地写成 data.json 快照，已折叠的日志行转存到 data/history.jsonl
+作为编辑历史。启动时 recover() 把快照之后未压缩的日志重放进 data.json。
+
+每行带递增的 seq，快照记录 journal_seq；压缩过程中崩溃时重放会跳过已折叠的行。
+追加或压缩失败后，下一次修改或退出时直接压缩，用内存中的树补上缺失的编辑。
+"""
+import json
+import os
+import time
+import db
+import tree_model
+from persistence import atomic_write, dump_compact, write_errors
+
+JOURNAL_FILE = os.path.join(tree_model.get_base_dir(), "data", "data.journal")
+HISTORY_FILE = os.path.join(tree_model.get_base_dir(), "data", "history.jsonl")
+COMPACT_EVERY = 200
+
+def _append(path, line):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def _read_ops(path):
+    ops = []
+    if not os.path.exists(path):
+        return ops
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                # 最后一行可能因崩溃只写了一半
+                break
+    return ops
+
+def _compact_files(snapshot_path, text, journal_path, history_path):
+    # 先原子地写快照，再把日志转存到历史并删除
+    atomic_write(snapshot_path, text)
+    if os.path.exists(journal_path):
+        with open(journal_path, "r", encoding="utf-8") as src, open(history_path, "a", encoding="utf-8") as dst:
+            # 崩溃留下的半行不转存
+            dst.writelines(line for line in src if line.endswith("\n"))
+        os.remove(journal_path)
+
+def replay(root, ops, after_seq=0):
+    """在 root 上重放 seq 大于 after_seq 的操作，返回最后的 seq。"""
+    model = tree_model.TreeModel(root)
+    seq = after_seq
+    for op in ops:
+        if op.get("seq", 0) <= after_seq:
+            continue
+        try:
+            model.apply(op)
+        except (KeyError, ValueError):
+            pass  # 引用了不存在的节点，跳过
+        seq = op.get("seq", seq)
+    return seq
+
+def recover(snapshot_path=None, journal_path=None, history_path=None):
+    """启动时调用：若有未压缩的日志，重放到快照中并写回 data.json。"""
+    snapshot_path = snapshot_path or tree_model.DATA_FILE
+    journal_path = journal_path or JOURNAL_FILE
+    ops = _read_ops(journal_path)
+    if not ops:
+        return
+    root = tree_model.load_data(snapshot_path)
+    seq = replay(root, ops, root.pop("journal_seq", 0))
+    _compact_files(snapshot_path, dump_compact(dict(root, journal_seq=seq)),
+                   journal_path, history_path or HISTORY_FILE)
+
+class JournalPersister:
+    def __init__(self, model, path=None, snapshot_path=None, history_path=None):
+        self.model = model
+        self.path = path or JOURNAL_FILE
+        self.snapshot_path = snapshot_path or tree_model.DATA_FILE
+        self.history_path = history_path or HISTORY_FILE
+        self.seq = model.root.pop("journal_seq", 0)
+        self.pending = 0
+        self.needs_compact = False   # 有追加或压缩失败，需要用内存中的树重写快照
+        model.add_listener(self.on_changed)
+        if model.needs_save:
+            self.compact()
+
+    def on_changed(self, op, node):
+        # 在 GUI 线程中序列化（op 引用的节点之后可能再被修改），追加交给 db.writer
+        self.seq += 1
+        if self.needs_compact:
+            # 日志中缺了记录，直接写出包含本次修改的快照
+            self.compact()
+            return
+        line = dump_compact(dict(op, seq=self.seq, ts=int(time.time())))
+        self._submit(_append, self.path, line)
+        self.pending += 1
+        if self.pending >= COMPACT_EVERY:
+            self.compact()
+
+    def _submit(self, func, *args):
+        db.writer.submit(func, *args, callback=write_errors.callback("保存项目树编辑日志失败", self._write_failed))
+
+    def _write_failed(self):
+        self.needs_compact = True
+
+    def compact(self):
+        self.pending = 0
+        self.needs_compact = False
+        text = dump_compact(dict(self.model.root, journal_seq=self.seq))
+        self._submit(_compact_files, self.snapshot_path, text, self.path, self.history_path)
+
+    def flush(self):
+        if self.pending or self.needs_compact:
+            self.compact()
@@ -0,0 +1,277 @@
+"""
+项目树、复习、统计三个树状图共用的布局。
+
+叶子从左到右间隔 x_offset，父节点位于子节点的平均横坐标，纵坐标为深度 * y_offset。
+每个 (tree_x_offset, tree_y_offset, 视图) 对应一个 TreeLayout，位置保存在这里而不写入
+节点字典，不会随 data.json 持久化。
+
+各视图的折叠状态不同（见 collapse）：折叠的节点按一个叶子布局，其后代不在布局中。
+
+TreeLayout 监听共享树模型：增、删、移动节点时只重新布局受影响的子树，把其后的
+叶子整体平移，再沿祖先链重算父节点坐标，代价与位置变化的节点数成正比。
+视图用 changed_since(version) 取得位置变化、新出现、消失的节点以及文字可能变化的祖先，
+只处理这些图元。
+"""
+import traversal
+import tree_model
+
+LOG_SIZE = 64   # 保留最近多少次结构修改的变化记录
+EPSILON = 1e-6  # 坐标比较容差：平移、求平均的浮点误差不算位置变化
+
+class TreeLayout:
+    def __init__(self, model, x_offset, y_offset, collapsed=None):
+        self.model = model
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+        self.collapsed = collapsed if collapsed is not None else set()   # 折叠节点 id，由视图修改
+        self.positions = {}    # {node_id: [x, y]}，只含可见节点
+        self.leaf_start = {}   # {node_id: 子树第一个叶子的序号}
+        self.leaf_count = {}   # {node_id: 子树叶子数}
+        self.parent = {}       # {node_id: parent_id}
+        self.depth = {}        # {node_id: 深度}
+        self.version = None    # 已同步到的模型结构版本
+        self.built_version = None
+        self.log = []          # [(version, 位置变化, 新出现, 消失, 需重新生成文字的 node_id 集合)]
+        self._hidden = {}      # {折叠节点 id: 隐藏的后代数}
+        self._hidden_version = None
+
+    def ensure(self):
+        if self.version != self.model.version:
+            self.build()
+
+    def build(self):
+        """全量重建；折叠 / 展开节点后由视图调用。"""
+        self.positions.clear()
+        self.leaf_start.clear()
+        self.leaf_count.clear()
+        self.parent.clear()
+        self.depth.clear()
+        self._layout_subtree(self.model.root, None, 0, 0)
+        self.version = self.built_version = self.model.version
+        self.log = []
+
+    def _layout_subtree(self, node, parent_id, depth, first_leaf):
+        # 单次后序遍历布局 node 子树，叶子从 first_leaf 开始编号
+        leaf = first_leaf
+        for n, parent, d in traversal.postorder(node, self.collapsed):
+            node_id = n["id"]
+            children = self._children(n)
+            if children:
+                self.leaf_start[node_id] = self.leaf_start[children[0]["id"]]
+                self.leaf_count[node_id] = sum(self.leaf_count[ch["id"]] for ch in children)
+                x = sum(self.positions[ch["id"]][0] for ch in children) / len(children)
+            else:
+                self.leaf_start[node_id] = leaf
+                self.leaf_count[node_id] = 1
+                x = leaf * self.x_offset
+                leaf += 1
+            self.positions[node_id] = [x, (depth + d) * self.y_offset]
+            self.depth[node_id] = depth + d
+            self.parent[node_id] = parent["id"] if parent is not None else parent_id
+
+    def _children(self, node):
+        # 参与布局的子节点，折叠的节点没有
+        if node["id"] in self.collapsed:
+            return ()
+        return node.get("children") or ()
+
+    def _expanded(self, node_id):
+        # node_id 可见且未折叠时，其子节点参与布局
+        return node_id in self.positions and node_id not in self.collapsed
+
+    def _ancestors(self, node_id):
+        while node_id is not None:
+            yield node_id
+            node_id = self.parent.get(node_id)
+
+    def _visible_ancestors(self, node_id):
+        # 从 node_id 起最近的可见节点及其全部祖先
+        while node_id is not None and node_id not in self.positions:
+            node_id = self.model.parent.get(node_id)
+        return set(self._ancestors(node_id))
+
+    def _shift_after(self, parent_id, boundary, delta, changed):
+        # 沿祖先链把叶子序号 >= boundary 的兄弟子树整体平移 delta 个叶子
+        if not delta:
+            return
+        path_child = None   # 祖先链上的子节点包含插入 / 删除位置，本身不平移
+        for a in self._ancestors(parent_id):
+            for ch in self.model.get(a).get("children", []):
+                start = self.leaf_start.get(ch["id"])
+                if start is None or start < boundary or ch["id"] == path_child:
+                    continue
+                for n in traversal.iter_nodes(ch, self.collapsed):
+                    node_id = n["id"]
+                    if node_id in self.leaf_start:
+                        changed.setdefault(node_id, tuple(self.positions[node_id]))
+                        self.leaf_start[node_id] += delta
+                        self.positions[node_id][0] += delta * self.x_offset
+            path_child = a
+
+    def _detach(self, node, parent_id, changed):
+        # 从缓存中摘除 node 子树（模型中已经不在原父节点下），返回摘除的可见节点
+        start = self.leaf_start[node["id"]]
+        count = self.leaf_count[node["id"]]
+        detached = set()
+        for n in traversal.iter_nodes(node, self.collapsed):
+            if n["id"] in self.positions:
+                detached.add(n["id"])
+                changed.setdefault(n["id"], tuple(self.positions[n["id"]]))
+            for cache in (self.positions, self.leaf_start, self.leaf_count, self.parent, self.depth):
+                cache.pop(n["id"], None)
+        # 同一父节点下移动时 node 已回到 children 中，不计在内
+        becomes_leaf = not any(ch is not node for ch in self.model.get(parent_id).get("children", []))
+        delta = -(count - 1) if becomes_leaf else -count
+        self._shift_after(parent_id, start + count, delta, changed)
+        for a in self._ancestors(parent_id):
+            self.leaf_count[a] += delta
+        return detached
+
+    def _attach(self, node, parent_id, changed):
+        # node 子树已插入模型中 parent_id 下，缓存中尚无其条目；返回加入的可见节点
+        parent = self.model.get(parent_id)
+        siblings = parent["children"]
+        was_leaf = len(siblings) == 1
+        index = next(i for i, ch in enumerate(siblings) if ch is node)
+        if was_leaf:
+            boundary = self.leaf_start[parent_id] + 1
+        elif index + 1 < len(siblings):
+            boundary = self.leaf_start[siblings[index + 1]["id"]]
+        else:
+            boundary = self.leaf_start[parent_id] + self.leaf_count[parent_id]
+        first_leaf = boundary - 1 if was_leaf else boundary
+        count = sum(1 for n in traversal.iter_nodes(node, self.collapsed) if not self._children(n))
+        delta = count - 1 if was_leaf else count
+        self._shift_after(parent_id, boundary, delta, changed)
+        self._layout_subtree(node, parent_id, self.depth[parent_id] + 1, first_leaf)
+        attached = {n["id"] for n in traversal.iter_nodes(node, self.collapsed)}
+        for node_id in attached:
+            changed.setdefault(node_id, None)
+        for a in self._ancestors(parent_id):
+            self.leaf_count[a] += delta
+        return attached
+
+    def _recompute(self, parent_ids, changed):
+        # 自下而上重算受影响祖先的坐标
+        chain = {}
+        for pid in parent_ids:
+            for a in self._ancestors(pid):
+                chain[a] = self.depth[a]
+        for a in sorted(chain, key=chain.get, reverse=True):
+            children = self._children(self.model.get(a))
+            if children:
+                x = sum(self.positions[ch["id"]][0] for ch in children) / len(children)
+            else:
+                x = self.leaf_start[a] * self.x_offset
+            if abs(x - self.positions[a][0]) > EPSILON:
+                changed.setdefault(a, tuple(self.positions[a]))
+                self.positions[a][0] = x
+
+    def apply(self, op, node):
+        """把一次结构修改同步到布局；没有同步到前一版本时留待下次 ensure 全量重建。
+
+        折叠子树内部的修改不改变任何可见节点的位置，但其折叠祖先的徽标和时长汇总会变。
+        """
+        if op["op"] not in ("add", "remove", "move"):
+            return
+        if self.version != self.model.version - 1:
+            return
+        changed = {}   # {node_id: 本次修改前的坐标}，新布局的节点为 None
+        detached = attached = set()
+        restyled = set()   # 子树时长汇总、折叠徽标可能变化的可见节点
+        parent_ids = []
+        if op["op"] in ("remove", "move"):
+            if node["id"] in self.positions:
+                parent_id = self.parent[node["id"]]
+                detached = self._detach(node, parent_id, changed)
+                parent_ids.append(parent_id)
+                restyled |= set(self._ancestors(parent_id))
+            else:
+                # 原父节点在折叠子树中、模型里已查不到，重新生成所有可见折叠节点及其祖先
+                for node_id in self.collapsed:
+                    if node_id in self.positions:
+                        restyled |= set(self._ancestors(node_id))
+        if op["op"] in ("add", "move"):
+            if self._expanded(op["parent"]):
+                attached = self._attach(node, op["parent"], changed)
+                parent_ids.append(op["parent"])
+            restyled |= self._visible_ancestors(op["parent"])
+        self._recompute(parent_ids, changed)
+        added = attached - detached
+        removed = detached - attached
+        # 先平移再移回（同一父节点下移动等）的节点最终位置不变，不算移动；
+        # 被移动的节点本身即使坐标相同也可能换了父节点，连线要重画
+        moved = {node_id for node_id, old in changed.items()
+                 if node_id in self.positions and node_id not in added and not self._same_pos(old, node_id)}
+        if node["id"] in attached & detached:
+            moved.add(node["id"])
+        self.version = self.model.version
+        self.log.append((self.version, moved, added, removed, restyled - removed))
+        del self.log[:-LOG_SIZE]
+
+    def _same_pos(self, old, node_id):
+        x, y = self.positions[node_id]
+        return old is not None and abs(old[0] - x) <= EPSILON and abs(old[1] - y) <= EPSILON
+
+    def hidden_count(self, node_id):
+        """折叠节点下隐藏的后代数，按模型结构版本缓存。"""
+        if self._hidden_version != self.model.version:
+            self._hidden = {}
+            self._hidden_version = self.model.version
+        count = self._hidden.get(node_id)
+        if count is None:
+            count = self._hidden[node_id] = sum(1 for _ in traversal.iter_nodes(self.model.get(node_id))) - 1
+        return count
+
+    def changed_since(self, version):
+        """version 之后的布局变化 (moved, added, removed, restyled)：位置变化、新出现、消失的
+        node_id，以及文字可能变化（时长汇总、折叠徽标）的节点。记录不足（或期间全量重建过）
+        时返回 None。
+        """
+        if version is None or version < self.built_version:
+            return None
+        moved, added, removed, restyled = set(), set(), set(), set()
+        if version == self.version:
+            return moved, added, removed, restyled
+        if not self.log or self.log[0][0] > version + 1:
+            return None
+        for v, ch, add, rem, style in self.log:
+            if v <= version:
+                continue
+            for node_id in rem:
+                moved.discard(node_id)
+                restyled.discard(node_id)
+                if node_id in added:
+                    added.discard(node_id)
+                else:
+                    removed.add(node_id)
+            for node_id in add:
+                if node_id in removed:
+                    # 先消失又重新出现（移进折叠子树再移出），按移动处理
+                    removed.discard(node_id)
+                    moved.add(node_id)
+                    restyled.add(node_id)
+                else:
+                    added.add(node_id)
+            moved |= ch
+            restyled |= style
+        moved -= added | removed
+        restyled -= removed
+        return moved, added, removed, restyled
+
+_layouts = {}
+
+def get_layout(model, x_offset, y_offset, view=None, collapsed=None):
+    """view 为视图名，collapsed 为该视图折叠节点 id 的集合（布局持有引用，修改后需 build）。"""
+    key = (x_offset, y_offset, view)
+    layout = _layouts.get(key)
+    if layout is None or layout.model is not model:
+        layout = _layouts[key] = TreeLayout(model, x_offset, y_offset, collapsed)
+    layout.ensure()
+    return layout
+
+def _on_tree_changed(op, node):
+    for layout in _layouts.values():
+        layout.apply(op, node)
+
+tree_model.add_listener(_on_tree_changed)
@@ -2,12 +2,17 @@ import sys
 from PyQt5.QtCore import Qt, QCoreApplication
 QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
 from PyQt5.QtWidgets import QApplication, QMainWindow, QStackedWidget, QAction, QMenuBar
-from settings import SettingsWidget
+from settings import SettingsWidget, load_settings
 from timer import TimerWidget
 from project_tree import ProjectTreeWidget
 from review import ReviewWidget
 from stats import StatsWidget
+from outline import OutlineWidget
 import db
+import tree_model
+from persistence import JsonPersister, write_errors
+import node_store
+import journal
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -20,12 +25,28 @@ class MainWindow(QMainWindow):
         # 记录跳转到timer之前的页面索引
         self.previous_page_index = 2  # 默认为Projects页面
 
-        db.init_db()  # 初始化数据库
+        # 初始化数据库，可选启用学习/复习统一存储
+        db.init_db(unified=bool(load_settings().get("unified_session_store", False)))
+
+        # 项目树存储：默认 data.json（合并、原子地写回），可选追加式编辑日志或 SQLite node 表（按行增量写入）
+        # 上次未压缩的编辑日志先重放进 data.json，各存储方式都从一致的快照开始
+        journal.recover()
+        self.tree_backend = load_settings().get("tree_backend", "json")
+        if self.tree_backend == "sqlite":
+            self.persister = node_store.NodeStore()
+            self.persister.attach(tree_model.init_model(self.persister.load()))
+        elif self.tree_backend == "journal":
+            self.persister = journal.JournalPersister(tree_model.get_model())
+        else:
+            self.persister = JsonPersister(tree_model.get_model())
+        # 项目树后台写入失败时提示（各存储方式已标记为待重写，下次修改或退出时重试）
+        write_errors.error.connect(self.show_write_error)
 
         self.settings = SettingsWidget()
         self.project = ProjectTreeWidget(self)
         self.review = ReviewWidget(self)
         self.stats = StatsWidget(self)
+        self.outline = OutlineWidget(self)
         self.timer = TimerWidget(self)
         from timeline_plotly import TimelinePlotlyWidget
         self.timeline_plotly = TimelinePlotlyWidget(self)
@@ -36,12 +57,13 @@ class MainWindow(QMainWindow):
         self.stack.addWidget(self.review)     # 3
         self.stack.addWidget(self.stats)      # 4
         self.stack.addWidget(self.timeline_plotly)   # 5
+        self.stack.addWidget(self.outline)    # 6
 
         menubar = QMenuBar(self)
         self.setMenuBar(menubar)
         # 修改：隐藏Timer选项，只保留其他页面
-        pages = ["Settings", "Projects", "Review", "Stats", "Timeline"]
-        page_indices = [0, 2, 3, 4, 5]
+        pages = ["Settings", "Projects", "Outline", "Review", "Stats", "Timeline"]
+        page_indices = [0, 2, 6, 3, 4, 5]
         for i, name in enumerate(pages):
             act = QAction(name, self)
             act.triggered.connect(lambda _, idx=page_indices[i]: self.stack.setCurrentIndex(idx))
@@ -53,6 +75,10 @@ class MainWindow(QMainWindow):
         self.stack.setCurrentIndex(1)
         self.timer.set_node(node, mode)
 
+    def show_write_error(self, message):
+        from PyQt5.QtWidgets import QMessageBox
+        QMessageBox.warning(self, "Save Failed", message)
+
     def return_from_timer(self):
         """从timer返回到之前的页面"""
         self.stack.setCurrentIndex(self.previous_page_index)
@@ -69,12 +95,37 @@ class MainWindow(QMainWindow):
             )
             event.ignore()  # 忽略关闭事件，阻止关闭
         else:
+            self.persister.flush()  # 写出尚未保存的树修改
+            self.timer.flush()  # 重试写入失败的计时记录
+            if self.tree_backend == "sqlite" and load_settings().get("tree_backend", "json") != "sqlite":
+                # 切回 JSON 存储：导出到 data.json，清空 node 表
+                node_store.export_json(tree_model.get_model().root)
+                self.persister.clear()
+            db.close_all()  # 等待后台写入并关闭数据库长连接
             event.accept()  # 接受关闭事件，允许关闭
 
+    def relayout_all(self, timeline=False):
+        # 增、删、移动节点后，三个树状图只处理布局记录中受影响的图元
+        self.project.relayout()
+        self.review.relayout()
+        self.stats.relayout()
+        self.outline.relayout()
+        if timeline and hasattr(self, 'timeline_plotly'):
+            self.timeline_plotly.refresh_timeline()
+
+    def update_node(self, node_id, timeline=False):
+        # 只改了一个节点的名称、颜色等属性，只更新它的图元（大纲经模型监听自行更新）
+        self.project.update_node(node_id)
+        self.review.update_node(node_id)
+        self.stats.update_node(node_id)
+        if timeline and hasattr(self, 'timeline_plotly'):
+            self.timeline_plotly.refresh_timeline()
+
     def refresh_all(self):
         self.project.refresh()
         self.review.refresh()
         self.stats.refresh()
+        self.outline.refresh()
         if hasattr(self, 'timeline_plotly'):
             self.timeline_plotly.refresh_timeline()
 
@@ -0,0 +1,180 @@
+"""
+可选的项目树存储后端：节点保存在 data/nodes.db 的 node 表中。
+
+监听共享树模型的修改，每次编辑只写受影响的行（改名、完成、颜色、复习设置
+都是单行 UPDATE，新增为单行 INSERT），写入交给 db.writer 后台线程。
+某次写入失败后，下一次修改或退出时用内存中的整棵树重写 node 表。
+首次启用时从 data.json 导入，切回 JSON 存储时再导出。
+"""
+import os
+import db
+import traversal
+import tree_model
+from persistence import atomic_write, dump_compact, write_errors
+
+NODE_DB = os.path.join(tree_model.get_base_dir(), "data", "nodes.db")
+# node 表中保存的节点字段，其余字段（children、pos 等）不持久化
+NODE_FIELDS = ("name", "done", "done_time", "color", "review_state", "period", "lastreview")
+BOOL_FIELDS = ("done", "review_state")
+
+def _node_v1(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS node (
+            id TEXT PRIMARY KEY,
+            parent_id TEXT,
+            ord INTEGER NOT NULL DEFAULT 0,
+            name TEXT,
+            done INTEGER,
+            done_time INTEGER,
+            color TEXT,
+            review_state INTEGER,
+            period INTEGER,
+            lastreview INTEGER
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_node_parent ON node (parent_id, ord)")
+
+_NODE_MIGRATIONS = [_node_v1]
+
+def _row(node, parent_id, ord):
+    values = []
+    for field in NODE_FIELDS:
+        value = node.get(field)
+        if field in BOOL_FIELDS and value is not None:
+            value = int(bool(value))
+        values.append(value)
+    return (node["id"], parent_id, ord, *values)
+
+def _subtree_rows(node, parent_id, ord):
+    rows = []
+    next_ord = {}   # {parent_id: 下一个子节点的 ord}，先序遍历按顺序产出兄弟节点
+    for n, parent, _ in traversal.preorder(node):
+        if parent is None:
+            rows.append(_row(n, parent_id, ord))
+        else:
+            o = next_ord.get(parent["id"], 0)
+            next_ord[parent["id"]] = o + 1
+            rows.append(_row(n, parent["id"], o))
+    return rows
+
+_INSERT_SQL = (f"INSERT OR REPLACE INTO node (id, parent_id, ord, {', '.join(NODE_FIELDS)})"
+               f" VALUES ({', '.join('?' * (3 + len(NODE_FIELDS)))})")
+
+# 追加到末尾的节点排在现有兄弟之后：删除、跨父节点移动会在 ord 中留下空位，
+# 按下标写入的 ord 可能不大于已有兄弟的 ord
+_APPEND_ORD_SQL = """
+    UPDATE node SET ord = (SELECT COALESCE(MAX(ord), -1) + 1 FROM node WHERE parent_id = ? AND id <> ?)
+    WHERE id = ?
+"""
+
+_DELETE_SUBTREE_SQL = """
+    WITH RECURSIVE sub(id) AS (
+        SELECT ? UNION ALL SELECT node.id FROM node JOIN sub ON node.parent_id = sub.id
+    )
+    DELETE FROM node WHERE id IN (SELECT id FROM sub)
+"""
+
+def export_json(root, path=None):
+    """把树写回 data.json（格式与 JSON 存储一致）。"""
+    atomic_write(path or tree_model.DATA_FILE, dump_compact(root))
+
+class NodeStore:
+    def __init__(self, path=None):
+        self.path = path or NODE_DB
+        db.migrate(db.get_connection(self.path), _NODE_MIGRATIONS)
+        self.model = None
+        self.needs_resync = False   # 有写入失败，node 表可能与内存中的树不一致
+
+    def is_empty(self):
+        return not db.query(self.path, "SELECT 1 FROM node LIMIT 1")
+
+    def import_json(self, root):
+        """一次性导入：用 data.json 的树替换 node 表内容。"""
+        db.execute_batch(self.path, self._replace_statements(root))
+
+    def _replace_statements(self, root):
+        return [("DELETE FROM node", [()]), (_INSERT_SQL, _subtree_rows(root, None, 0))]
+
+    def load(self):
+        """读出整棵树；node 表为空时先从 data.json 导入。"""
+        if self.is_empty():
+            self.import_json(tree_model.load_data())
+        rows = db.query(self.path, f"SELECT id, parent_id, {', '.join(NODE_FIELDS)} FROM node ORDER BY ord")
+        nodes = {}
+        children = {}
+        root = None
+        for node_id, parent_id, *values in rows:
+            node = {"id": node_id, "children": []}
+            for field, value in zip(NODE_FIELDS, values):
+                if value is None:
+                    continue
+                node[field] = bool(value) if field in BOOL_FIELDS else value
+            nodes[node_id] = node
+            if parent_id is None:
+                root = node
+            else:
+                children.setdefault(parent_id, []).append(node)
+        for parent_id, chs in children.items():
+            if parent_id in nodes:
+                nodes[parent_id]["children"] = chs
+        return root
+
+    def attach(self, model):
+        self.model = model
+        model.add_listener(self.on_changed)
+
+    def _submit(self, func, *args):
+        db.writer.submit(func, *args, callback=write_errors.callback("保存项目树（nodes.db）失败", self._write_failed))
+
+    def _write_failed(self):
+        self.needs_resync = True
+
+    def _resync(self):
+        # 一个事务内用整棵树替换 node 表
+        self.needs_resync = False
+        self._submit(db.execute_batch, self.path, self._replace_statements(self.model.root))
+
+    def _write_order(self, parent):
+        # 重写某个父节点下所有子节点的 ord（兄弟间插入 / 移动时）
+        rows = [(i, ch["id"]) for i, ch in enumerate(parent.get("children", []))]
+        self._submit(db.execute_many, self.path, "UPDATE node SET ord=? WHERE id=?", rows)
+
+    def on_changed(self, op, node):
+        if self.needs_resync:
+            # 整表重写已包含本次修改
+            self._resync()
+            return
+        kind = op["op"]
+        if kind == "add":
+            parent = self.model.get(op["parent"])
+            index = parent["children"].index(node)
+            rows = _subtree_rows(node, parent["id"], index)
+            if index == len(parent["children"]) - 1:
+                statements = [(_INSERT_SQL, rows), (_APPEND_ORD_SQL, [(parent["id"], node["id"], node["id"])])]
+                self._submit(db.execute_batch, self.path, statements)
+            else:
+                self._submit(db.execute_many, self.path, _INSERT_SQL, rows)
+                self._write_order(parent)
+        elif kind == "remove":
+            self._submit(db.execute, self.path, _DELETE_SUBTREE_SQL, (node["id"],))
+        elif kind == "move":
+            parent = self.model.get(op["parent"])
+            self._submit(db.execute_many, self.path, "UPDATE node SET parent_id=? WHERE id=?", [(parent["id"], node["id"])])
+            self._write_order(parent)
+        elif kind == "update":
+            fields = [f for f in op.get("set", {}) if f in NODE_FIELDS]
+            fields += [f for f in op.get("unset", []) if f in NODE_FIELDS and f not in fields]
+            if fields:
+                row = _row(node, None, 0)[3:]
+                values = [row[NODE_FIELDS.index(f)] for f in fields]
+                sql = f"UPDATE node SET {', '.join(f + '=?' for f in fields)} WHERE id=?"
+                self._submit(db.execute_many, self.path, sql, [(*values, node["id"])])
+
+    def flush(self):
+        # 写入已经排在 db.writer 中，退出时由 db.close_all 等待完成；此前有写入失败时整表重写
+        if self.needs_resync:
+            self._resync()
+
+    def clear(self):
+        # 切回 JSON 存储后清空，下次启用时重新从 data.json 导入
+        self._submit(db.execute, self.path, "DELETE FROM node")
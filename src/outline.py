@@ -0,0 +1,304 @@
+"""
+大纲页：用 QTreeView 按行显示项目树，节点上万、树状图难以使用时代替 Projects 页。
+
+OutlineModel 直接读取共享树模型，不复制节点：子节点按 FETCH_BATCH 分批经
+canFetchMore / fetchMore 暴露，展开时才载入，增删、移动节点时按行通知视图；
+时长列在 data() 中按需从增量汇总缓存读取，只有可见行会被请求。右键菜单的操作
+与项目树相同，选中节点后交给 ProjectTreeWidget 执行（两者共用 selection）。
+"""
+import datetime
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTreeView, QMenu
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex
+from PyQt5.QtGui import QColor
+import db
+import rollup
+import selection
+import tree_model
+from project_tree import format_seconds
+
+FETCH_BATCH = 200   # 每次展开 / 滚动到底部时暴露的子节点数
+COLUMNS = ("Name", "Done", "Learn", "Review", "Next Review")
+
+class OutlineModel(QAbstractItemModel):
+    """根节点作为唯一的顶层行；QModelIndex.internalId 为 node_id 的整数编号。
+
+    已暴露的行单独记在 exposed 中，总是各父节点子列表的前缀：树模型的监听器在修改
+    之后才被调用，行的增删、移动按 begin*/end* 逐步同步到 exposed，期间视图读到的
+    始终是修改前后一致的行结构。
+    """
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.exposed = {}   # {node_id: 已暴露的子节点 id 列表}，None 表示顶层
+        self.rows = {}      # {node_id: 在父节点下的行号}，只含已暴露的节点
+        self.parents = {}   # {node_id: 父节点 id}，只含已暴露的节点，顶层为 None
+        self._keys = {}     # {node_id: 整数编号}
+        self._ids = []      # 整数编号 -> node_id
+        tree_model.add_listener(self._on_tree_changed)
+
+    def _key(self, node_id):
+        key = self._keys.get(node_id)
+        if key is None:
+            key = self._keys[node_id] = len(self._ids)
+            self._ids.append(node_id)
+        return key
+
+    def _children(self, node):
+        if node is None:
+            return [self.model.root]
+        return node.get("children") or ()
+
+    def node(self, index):
+        """index 对应的节点字典，顶层（无效 index）或节点已删除时返回 None。"""
+        if not index.isValid():
+            return None
+        return self.model.get(self._ids[index.internalId()])
+
+    def _parent_key(self, index):
+        # index 对应的 exposed 键：顶层为 None，已删除的节点返回 False
+        if not index.isValid():
+            return None
+        node_id = self._ids[index.internalId()]
+        return node_id if node_id in self.rows else False
+
+    def node_index(self, node_id, column=0):
+        """已暴露节点的 index，未暴露时返回无效 index。"""
+        row = self.rows.get(node_id)
+        if row is None:
+            return QModelIndex()
+        return self.createIndex(row, column, self._key(node_id))
+
+    def _renumber(self, parent_id, start):
+        for row, node_id in enumerate(self.exposed[parent_id][start:], start):
+            self.rows[node_id] = row
+
+    def _insert(self, node_id, parent_id, row):
+        # 新位置落在父节点已暴露的前缀之内（或紧接其后）时才插入一行，否则留给 fetchMore
+        if parent_id not in self.rows:
+            return
+        siblings = self.exposed.setdefault(parent_id, [])
+        if row > len(siblings):
+            return
+        self.beginInsertRows(self.node_index(parent_id), row, row)
+        siblings.insert(row, node_id)
+        self.parents[node_id] = parent_id
+        self._renumber(parent_id, row)
+        self.endInsertRows()
+
+    def _forget(self, node_id):
+        # 删除 node_id 及其已暴露后代的记录
+        stack = [node_id]
+        while stack:
+            n = stack.pop()
+            self.rows.pop(n, None)
+            self.parents.pop(n, None)
+            stack.extend(self.exposed.pop(n, ()))
+
+    def _remove(self, node_id):
+        parent_id = self.parents[node_id]
+        row = self.rows[node_id]
+        self.beginRemoveRows(self.node_index(parent_id), row, row)
+        del self.exposed[parent_id][row]
+        self._forget(node_id)
+        self._renumber(parent_id, row)
+        self.endRemoveRows()
+
+    def _move(self, node_id, parent_id, index):
+        old_parent_id = self.parents[node_id]
+        row = self.rows[node_id]
+        siblings = self.exposed.get(parent_id, [])
+        count = len(siblings) - 1 if parent_id == old_parent_id else len(siblings)
+        if parent_id not in self.rows or index > count:
+            # 移到未暴露的位置：按删除处理
+            self._remove(node_id)
+            return
+        siblings = self.exposed.setdefault(parent_id, siblings)
+        if parent_id == old_parent_id and index == row:
+            return
+        # beginMoveRows 的目标行按移动前的行号计，同一父节点下后移时要加一
+        dest = index + 1 if parent_id == old_parent_id and index > row else index
+        self.beginMoveRows(self.node_index(old_parent_id), row, row, self.node_index(parent_id), dest)
+        del self.exposed[old_parent_id][row]
+        siblings.insert(index, node_id)
+        self.parents[node_id] = parent_id
+        self._renumber(old_parent_id, row)
+        self._renumber(parent_id, min(index, row) if parent_id == old_parent_id else index)
+        self.endMoveRows()
+
+    def _on_tree_changed(self, op, node):
+        kind = op["op"]
+        if kind == "update":
+            # 只通知已暴露的那一行
+            if op["id"] in self.rows:
+                self.dataChanged.emit(self.node_index(op["id"]), self.node_index(op["id"], len(COLUMNS) - 1))
+        elif kind == "add":
+            children = self.model.get(op["parent"])["children"]
+            self._insert(node["id"], op["parent"], op.get("index", len(children) - 1))
+        elif kind == "remove":
+            if node["id"] in self.rows:
+                self._remove(node["id"])
+        elif kind == "move":
+            if node["id"] in self.rows:
+                self._move(node["id"], op["parent"], op["index"])
+            else:
+                self._insert(node["id"], op["parent"], op["index"])
+
+    # ---- QAbstractItemModel ----
+
+    def index(self, row, column, parent=QModelIndex()):
+        key = self._parent_key(parent)
+        if key is False:
+            return QModelIndex()
+        siblings = self.exposed.get(key, ())
+        if not (0 <= row < len(siblings)) or not 0 <= column < len(COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, self._key(siblings[row]))
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_id = self.parents.get(self._ids[index.internalId()])
+        if parent_id is None:
+            return QModelIndex()
+        return self.node_index(parent_id)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        key = self._parent_key(parent)
+        if key is False:
+            return 0
+        return len(self.exposed.get(key, ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        # 子节点尚未载入时也显示展开箭头
+        if parent.column() > 0:
+            return False
+        key = self._parent_key(parent)
+        if key is False:
+            return False
+        if self.exposed.get(key):
+            return True
+        node = self.model.get(key) if key is not None else None
+        if parent.isValid() and node is None:
+            return False
+        return bool(self._children(node))
+
+    def canFetchMore(self, parent):
+        key = self._parent_key(parent)
+        if key is False:
+            return False
+        node = self.model.get(key) if key is not None else None
+        if parent.isValid() and node is None:
+            return False
+        return len(self.exposed.get(key, ())) < len(self._children(node))
+
+    def fetchMore(self, parent):
+        key = self._parent_key(parent)
+        if key is False:
+            return
+        node = self.model.get(key) if key is not None else None
+        children = self._children(node)
+        siblings = self.exposed.setdefault(key, [])
+        start = len(siblings)
+        end = min(len(children), start + FETCH_BATCH)
+        if end <= start:
+            return
+        self.beginInsertRows(parent, start, end - 1)
+        for row in range(start, end):
+            siblings.append(children[row]["id"])
+            self.rows[children[row]["id"]] = row
+            self.parents[children[row]["id"]] = key
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        node = self.node(index)
+        if node is None:
+            return None
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return node.get("name", "")
+            if column == 1:
+                return "✓" if node.get("done") else ""
+            if column == 2:
+                return format_seconds(rollup.get_rollup(db.DB_LEARN).total(node["id"]))
+            if column == 3:
+                return format_seconds(rollup.get_rollup(db.DB_REVIEW).total(node["id"]))
+            if column == 4 and node.get("review_state"):
+                # 还没复习过时没有下次复习日期
+                if not node.get("lastreview"):
+                    return ""
+                due = node["lastreview"] + node.get("period", 1) * 86400
+                return datetime.datetime.fromtimestamp(due).strftime("%Y-%m-%d")
+        elif role == Qt.DecorationRole and column == 0 and node.get("color"):
+            return QColor(node["color"])
+        return None
+
+class OutlineWidget(QWidget):
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.model = tree_model.get_model()
+        self.selection = selection.get_selection()   # 与三个树状图共用
+        layout = QVBoxLayout(self)
+        self.outline = OutlineModel(self.model, self)
+        self.view = QTreeView()
+        self.view.setUniformRowHeights(True)   # 行高一致，滚动时不逐行测量
+        self.view.setModel(self.outline)
+        self.view.setColumnWidth(0, 360)
+        layout.addWidget(self.view)
+        self.view.selectionModel().currentChanged.connect(self.current_changed)
+        self.selection.add_listener(self.show_selection)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
+        self.refresh()
+
+    def refresh(self):
+        # 时长列在绘制时读取，刷新只需重绘可见行
+        rollup.get_rollup(db.DB_LEARN).ensure(self.model.root)
+        rollup.get_rollup(db.DB_REVIEW).ensure(self.model.root)
+        self.view.viewport().update()
+
+    def relayout(self):
+        self.refresh()
+
+    def current_changed(self, current, previous):
+        node = self.outline.node(current)
+        if node is not None:
+            self.selection.select(node["id"])
+
+    def show_selection(self, node_id):
+        # 只定位到已暴露的行，不为其他视图中的选择展开大纲
+        index = self.outline.node_index(node_id) if node_id is not None else QModelIndex()
+        if index.isValid() and index != self.view.currentIndex():
+            self.view.setCurrentIndex(index)
+
+    def show_context_menu(self, pos):
+        node = self.outline.node(self.view.indexAt(pos))
+        if node is None:
+            return
+        self.selection.select(node["id"])
+        # 与项目树的右键菜单相同，操作作用于共用的选中节点
+        project = self.main_window.project
+        menu = QMenu(self)
+        menu.addAction("Start Learning", project.start_study)
+        menu.addAction("Toggle Done/Undone", project.toggle_done)
+        color_menu = menu.addMenu("Color")
+        color_menu.addAction("Change Color", project.change_node_color)
+        color_menu.addAction("Set to Default Color", project.set_node_default_color)
+        op_menu = menu.addMenu("Operation")
+        op_menu.addAction("Add Child Node", project.add_node)
+        op_menu.addAction("Delete Node", project.del_node)
+        op_menu.addAction("Rename Node", project.rename_node)
+        op_menu.addAction("Move Up", lambda: project.move_node(-1))
+        op_menu.addAction("Move Down", lambda: project.move_node(1))
+        menu.exec_(self.view.viewport().mapToGlobal(pos))
@@ -0,0 +1,98 @@
+"""
+data.json 的持久化。
+
+监听共享树模型的修改并标记为脏，短时间内的连续编辑合并为一次写入；
+内容哈希与上次写入相同时跳过。写入使用紧凑格式，先写临时文件再原子替换，
+实际的磁盘写入交给 db.writer 后台线程；写入失败时恢复脏标记留待下次重写，
+并经 write_errors 通知界面。
+"""
+import hashlib
+import json
+import os
+import tempfile
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+import db
+import tree_model
+
+DEBOUNCE_MS = 500
+
+def dump_compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def atomic_write(path, text):
+    # 临时文件与目标在同一目录，os.replace 保证读者只会看到完整的旧文件或新文件
+    fd, tmp = tempfile.mkstemp(prefix=".data-", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class WriteErrors(QObject):
+    """db.writer 后台写入失败的通知：callback 在写入线程中调用，经信号排队到 GUI 线程。"""
+    failed = pyqtSignal(object, str)   # (恢复函数, 错误说明)，内部使用
+    error = pyqtSignal(str)            # 恢复后发出，界面据此提示用户
+
+    def __init__(self):
+        super().__init__()
+        self.failed.connect(self._on_failed)
+
+    def callback(self, what, on_failure):
+        """返回 db.writer.submit 的 callback：写入失败时在 GUI 线程中调用 on_failure()。"""
+        def callback(error):
+            if error is not None:
+                self.failed.emit(on_failure, f"{what}：{error}")
+        return callback
+
+    @pyqtSlot(object, str)
+    def _on_failed(self, on_failure, message):
+        on_failure()
+        self.error.emit(message)
+
+write_errors = WriteErrors()
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class JsonPersister:
+    def __init__(self, model, path=None):
+        self.model = model
+        self.path = path or tree_model.DATA_FILE
+        # 启动时的内容视为已保存，除非加载时补了 id 或清理了布局字段
+        self.dirty = model.needs_save
+        self.last_digest = None if model.needs_save else _digest(dump_compact(model.root))
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_MS)
+        self.timer.timeout.connect(self.flush)
+        model.add_listener(self.on_changed)
+        if self.dirty:
+            self.timer.start()
+
+    def on_changed(self, op, node):
+        # 每次修改都重新计时，连续编辑只在停止后写一次
+        self.dirty = True
+        self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.dirty:
+            return
+        self.dirty = False
+        text = dump_compact(self.model.root)
+        digest = _digest(text)
+        if digest == self.last_digest:
+            return
+        self.last_digest = digest
+        db.writer.submit(atomic_write, self.path, text,
+                         callback=write_errors.callback("保存 data.json 失败", self._write_failed))
+
+    def _write_failed(self):
+        # 没有写成功：重新标记为脏，下次修改或退出时重写（不自动重试，避免磁盘满时反复提示）
+        self.dirty = True
+        self.last_digest = None
@@ -1,117 +1,46 @@
-import json, os, time, datetime, sys
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGraphicsView, QGraphicsScene, QMenu, QInputDialog, QMessageBox, QLabel
+import time, datetime
+from PyQt5.QtWidgets import QVBoxLayout, QMenu, QInputDialog, QMessageBox, QLabel
 from PyQt5.QtCore import Qt
-from tree_base import NodeItem, EdgeLine
+from tree_base import TreeView
 from settings import load_settings
-from PyQt5.QtGui import QPainter
 import db
-
-def get_base_dir():
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)
-    else:
-        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-DATA_FILE = os.path.join(get_base_dir(), "data", "data.json")
-
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"name": "Root", "id": "root", "children": [], "pos": [0, 0], "done": False, "lastreview": 0, "review_state": False}
-
-def save_data(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def ensure_ids(node):
-    import uuid
-    if "id" not in node:
-        node["id"] = str(uuid.uuid4())
-    for ch in node.get("children", []):
-        ensure_ids(ch)
+import rollup
+import traversal
+import tree_model
 
 def human_time(ts):
     if not ts:
         return "无"
     return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
 
-def total_review_time(node):
-    ids = []
-    def collect_ids(n):
-        ids.append(n.get("id"))
-        for ch in n.get("children", []):
-            collect_ids(ch)
-    collect_ids(node)
-    total = 0
-    for node_id in ids:
-        for _, _, start, end in db.get_records(db.DB_REVIEW, node_id):
-            total += end - start
-    return total
-
 def format_seconds(seconds):
     h = seconds // 3600
     m = (seconds % 3600) // 60
     s = seconds % 60
     return f"{h}h {m}m {s}s"
 
-class ReviewWidget(QWidget):
+class ReviewWidget(TreeView):
+    VIEW = "review"
+
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
         self.settings = load_settings()
-        self.data = load_data()
-        ensure_ids(self.data)
-        save_data(self.data)
+        self.model = tree_model.get_model()
+        self.data = self.model.root
         layout = QVBoxLayout(self)
-        self.scene = QGraphicsScene()
-        from tree_base import ZoomableGraphicsView
-        self.view = ZoomableGraphicsView(self.scene)
-        self.view.setRenderHint(QPainter.Antialiasing)
-        layout.addWidget(self.view)
+        self._init_scene(layout)
         self.suggest_label = QLabel()
         self.suggest_label.setStyleSheet("font-family: '霞鹜文楷'; font-size: 14px;")
         layout.addWidget(self.suggest_label)
-        self.node_items = []
-        self.selected_node = None
-        self.edges = []
         self.refresh()
         self.view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.view.customContextMenuRequested.connect(self.show_context_menu)
 
     def refresh(self):
-        self.data = load_data()
-        ensure_ids(self.data)
-        self.scene.clear()
-        self.node_items = []
-        self.edges = []
-        x_offset = int(self.settings.get("tree_x_offset", 300))
-        y_offset = int(self.settings.get("tree_y_offset", 120))
-
-        # 递归布局算法（与project_tree一致）
-        leaf_positions = []
-        def assign_leaf_positions(node, depth=0):
-            if not node.get("children"):
-                node["_leaf_index"] = len(leaf_positions)
-                leaf_positions.append(node)
-            else:
-                for ch in node.get("children", []):
-                    assign_leaf_positions(ch, depth+1)
-
-        def set_positions(node, depth=0):
-            y = depth * y_offset
-            if not node.get("children"):
-                x = node["_leaf_index"] * x_offset
-                node["pos"] = [x, y]
-                return x
-            else:
-                child_xs = [set_positions(ch, depth+1) for ch in node["children"]]
-                x = sum(child_xs) / len(child_xs)
-                node["pos"] = [x, y]
-                return x
-
-        assign_leaf_positions(self.data)
-        set_positions(self.data)
+        self.data = self.model.root
+        lay = self.tree_layout()
+        positions = lay.positions
 
         def get_node_color(node):
             settings = self.settings
@@ -122,52 +51,49 @@ class ReviewWidget(QWidget):
                 return node["color"]
             return settings.get("default_color", "#A0A0A0")
 
-        def draw_tree(node, parent_item=None):
+        def describe(node):
             color = get_node_color(node)
-            review_sec = total_review_time(node)
+            review_sec = review_rollup.total(node["id"])
             if node.get("review_state"):
                 period = node.get("period", None)
                 period_str = f"\nPeriod:{period}DAY" if period else ""
                 text = f'{node["name"]}{period_str}\nLast:{human_time(node.get("lastreview",0))}\nReview:{format_seconds(review_sec)}'
             else:
                 text = f'{node["name"]}\nReview:{format_seconds(review_sec)}'
-            item = NodeItem(node, color, text)
-            self.scene.addItem(item)
-            self.node_items.append(item)
-            if parent_item:
-                edge = EdgeLine(parent_item, item)
-                self.scene.addItem(edge)
-                self.edges.append(edge)
-            for ch in node.get("children", []):
-                draw_tree(ch, item)
-        draw_tree(self.data)
+            return color, text
+        def badge(node):
+            # 折叠节点的汇总：隐藏的后代数和子树复习时长
+            return f'+{lay.hidden_count(node["id"])} · {format_seconds(review_rollup.total(node["id"]))}'
+        # 复习时长来自增量汇总缓存，每个节点 O(1)
+        review_rollup = rollup.get_rollup(db.DB_REVIEW)
+        review_rollup.ensure(self.data)
+        # 与场景中现有的图元比对，只更新变化的部分
+        self.scene_sync.sync(self.data, positions, describe, self.collapse.ids, badge)
+        self.layout_version = lay.version
         self.show_suggest()
 
+    def relayout(self):
+        diff = super().relayout()
+        # 删除复习中的节点后建议列表随之变化
+        if diff is not None and diff[2]:
+            self.show_suggest()
+        return diff
+
+    def update_node(self, node_id):
+        super().update_node(node_id)
+        node = self.model.get(node_id)
+        if node is not None and node.get("review_state"):
+            self.show_suggest()
+
     def change_node_color(self):
-        node = self.selected_node
+        node, _ = self.get_selected()
         if node is None:
             return
         from PyQt5.QtWidgets import QColorDialog
         color = QColorDialog.getColor()
         if color.isValid():
-            node["color"] = color.name()
-            from project_tree import save_data
-            save_data(self.data)
-            self.refresh()
-
-    def get_selected(self):
-        if self.selected_node:
-            def find_parent(data, target):
-                for ch in data.get("children", []):
-                    if ch is target:
-                        return data
-                    res = find_parent(ch, target)
-                    if res:
-                        return res
-                return None
-            parent = find_parent(self.data, self.selected_node)
-            return self.selected_node, parent
-        return None, None
+            self.model.update(node["id"], color=color.name())
+            self.main_window.update_node(node["id"])
 
     def set_review(self):
         node, _ = self.get_selected()
@@ -176,19 +102,14 @@ class ReviewWidget(QWidget):
         period, ok = QInputDialog.getInt(self, "Review_Period", "SuggestedDays(天):", value=node.get("period", 1), min=1)
         if not ok:
             return
-        node["review_state"] = True
-        node["period"] = period
-        save_data(self.data)
+        self.model.update(node["id"], review_state=True, period=period)
         self.main_window.refresh_all()
 
     def unset_review(self):
         node, _ = self.get_selected()
         if node is None:
             return
-        node["review_state"] = False
-        if "period" in node:
-            del node["period"]
-        save_data(self.data)
+        self.model.update(node["id"], review_state=False, unset=["period"])
         self.main_window.refresh_all()
 
     def start_review(self):
@@ -199,23 +120,22 @@ class ReviewWidget(QWidget):
         self.main_window.show_timer(node, "review")
 
     def show_context_menu(self, pos):
-        view_pos = self.view.mapToScene(pos)
-        clicked_item = None
-        for item in self.node_items:
-            if item.contains(item.mapFromScene(view_pos)):
-                clicked_item = item
-                break
+        clicked_item = self.scene_sync.node_at(self.view.mapToScene(pos))
         if not clicked_item:
             return
-        self.selected_node = clicked_item.node_data
+        self.selection.select(clicked_item.node_data["id"])
         menu = QMenu(self)
         # Start Review 作为主菜单第一个选项
         menu.addAction("Start Review", self.start_review)
         # 只显示 Set Review 或 Unset Review
-        if self.selected_node.get("review_state"):
+        if clicked_item.node_data.get("review_state"):
             menu.addAction("Unset Review", self.unset_review)
         else:
             menu.addAction("Set Review", self.set_review)
+        # 有子节点时可折叠 / 展开
+        if clicked_item.node_data.get("children"):
+            collapsed = clicked_item.node_data["id"] in self.collapse.ids
+            menu.addAction("Expand" if collapsed else "Collapse", self.toggle_collapse)
         # Color 子菜单
         color_menu = menu.addMenu("Color")
         color_menu.addAction("Change Color", self.change_node_color)
@@ -224,27 +144,22 @@ class ReviewWidget(QWidget):
         menu.exec_(global_pos)
 
     def set_node_default_color(self):
-        node = self.selected_node
+        node, _ = self.get_selected()
         if node is None:
             return
         if "color" in node:
-            del node["color"]
-            from project_tree import save_data
-            save_data(self.data)
-            self.refresh()
+            self.model.update(node["id"], unset=["color"])
+            self.main_window.update_node(node["id"])
 
     def show_suggest(self):
         now = int(time.time())
         nodes = []
-        def collect(node):
+        for node in traversal.iter_nodes(self.data):
             if node.get("review_state"):
                 period = node.get("period", 1)
                 lastreview = node.get("lastreview", 0)
                 due = (now - lastreview) / (period * 86400) if period else 0
                 nodes.append((due, node))
-            for ch in node.get("children", []):
-                collect(ch)
-        collect(self.data)
         nodes.sort(reverse=True, key=lambda x: x[0])
         suggest = [f'{n["name"]} (Period{n.get("period",1)}DAY, Last:{human_time(n.get("lastreview",0))})' for _, n in nodes[:10]]
         self.suggest_label.setText("Suggest:\n" + "\n".join(suggest) if suggest else "All Perfect")
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+学习/复习时长的增量汇总缓存。
+
+每个数据库文件对应一个 TimeRollup，保存每个节点自身时长和子树总时长。
+写入记录（db.add_records）和共享树模型上的结构编辑（增、删、移动节点）时只更新
+受影响节点到根的路径，刷新界面时按 node_id O(1) 读取。
+"""
+import threading
+import db
+import traversal
+import tree_model
+
+class TimeRollup:
+    def __init__(self, dbfile):
+        self.dbfile = dbfile
+        self.own = None       # {node_id: 节点自身时长}
+        self.subtree = {}     # {node_id: 子树总时长}
+        self.parent = {}      # {node_id: parent_id}，根节点为 None
+        self.root_id = None
+        self._lock = threading.RLock()
+
+    def ensure(self, root):
+        """首次使用或换了根节点时，从数据库和树重建缓存。"""
+        with self._lock:
+            if self.own is None or self.root_id != root.get("id"):
+                self.attach(root)
+
+    def attach(self, root):
+        # 一次 GROUP BY 取每个节点自身时长，再单次后序遍历建立父指针和子树总和
+        with self._lock:
+            self.own = db.sum_seconds_by_node(self.dbfile)
+            self.parent = traversal.parent_map(root)
+            self.subtree = db.rollup_subtree_totals(root, self.own)
+            self.root_id = root.get("id")
+
+    def total(self, node_id):
+        return self.subtree.get(node_id, 0)
+
+    def _add_to_path(self, node_id, seconds):
+        while node_id is not None:
+            self.subtree[node_id] = self.subtree.get(node_id, 0) + seconds
+            node_id = self.parent.get(node_id)
+
+    def record_added(self, node_id, seconds):
+        with self._lock:
+            if self.own is None:
+                return
+            self.own[node_id] = self.own.get(node_id, 0) + seconds
+            if node_id in self.parent:
+                self._add_to_path(node_id, seconds)
+
+    def node_added(self, parent_id, node):
+        # 新节点（可能带子树）挂到 parent_id 下
+        with self._lock:
+            if self.own is None or parent_id not in self.parent:
+                return
+            self.parent.update(traversal.parent_map(node, parent_id))
+            added = db.rollup_subtree_totals(node, self.own)
+            self.subtree.update(added)
+            self._add_to_path(parent_id, added.get(node.get("id"), 0))
+
+    def node_removed(self, node):
+        # 从树中移除 node 及其子树，祖先减去其子树时长
+        with self._lock:
+            node_id = node.get("id")
+            if self.own is None or node_id not in self.parent:
+                return
+            seconds = self.subtree.get(node_id, 0)
+            self._add_to_path(self.parent[node_id], -seconds)
+            for n in traversal.iter_nodes(node):
+                self.parent.pop(n.get("id"), None)
+                self.subtree.pop(n.get("id"), None)
+
+    def node_moved(self, node_id, new_parent_id):
+        # 换父节点：旧祖先链减去、新祖先链加上子树时长；同级换序无需处理
+        with self._lock:
+            if self.own is None or node_id not in self.parent:
+                return
+            old_parent_id = self.parent[node_id]
+            if old_parent_id == new_parent_id:
+                return
+            seconds = self.subtree.get(node_id, 0)
+            self._add_to_path(old_parent_id, -seconds)
+            self.parent[node_id] = new_parent_id
+            self._add_to_path(new_parent_id, seconds)
+
+_rollups = {}
+
+def get_rollup(dbfile):
+    rollup = _rollups.get(dbfile)
+    if rollup is None:
+        rollup = _rollups[dbfile] = TimeRollup(dbfile)
+    return rollup
+
+def _on_records_added(dbfile, rows):
+    rollup = _rollups.get(dbfile)
+    if rollup is None:
+        return
+    for node_id, _, start, end in rows:
+        rollup.record_added(node_id, end - start)
+
+db.add_insert_listener(_on_records_added)
+
+def _on_tree_changed(op, node):
+    # 把共享树模型上的结构编辑同步到所有已建立的缓存
+    for rollup in _rollups.values():
+        if op["op"] == "add":
+            rollup.node_added(op["parent"], node)
+        elif op["op"] == "remove":
+            rollup.node_removed(node)
+        elif op["op"] == "move":
+            rollup.node_moved(op["id"], op["parent"])
+
+tree_model.add_listener(_on_tree_changed)
@@ -0,0 +1,43 @@
+"""
+项目树、复习、统计三个树状图共用的选中节点。
+
+只保存 node_id，不保存节点字典或图元：视图刷新、图元重建后仍指向同一个节点，
+按 id 从共享树模型中 O(1) 取回。节点被删除时自动取消选中。
+"""
+import tree_model
+
+class Selection:
+    def __init__(self):
+        self.node_id = None
+        self.listeners = []   # listener(node_id)，选中变化后调用
+
+    def select(self, node_id):
+        if node_id == self.node_id:
+            return
+        self.node_id = node_id
+        for listener in list(self.listeners):
+            listener(node_id)
+
+    def clear(self):
+        self.select(None)
+
+    def node(self):
+        """选中的节点字典，没有选中或节点已不存在时返回 None。"""
+        if self.node_id is None:
+            return None
+        return tree_model.get_model().get(self.node_id)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+_selection = Selection()
+
+def get_selection():
+    return _selection
+
+def _on_tree_changed(op, node):
+    # 删除的子树中包含选中节点时取消选中（模型中已经找不到它）
+    if op["op"] == "remove" and _selection.node_id is not None and _selection.node() is None:
+        _selection.clear()
+
+tree_model.add_listener(_on_tree_changed)
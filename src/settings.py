@@ -1,5 +1,5 @@
 import json, os, sys
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QColorDialog, QPushButton, QSpinBox, QHBoxLayout
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QColorDialog, QPushButton, QSpinBox, QHBoxLayout, QCheckBox, QComboBox, QDoubleSpinBox
 
 def get_base_dir():
     if getattr(sys, 'frozen', False):
@@ -8,6 +8,7 @@ def get_base_dir():
         return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SETTINGS_FILE = os.path.join(get_base_dir(), "data", "settings.json")
+TREE_BACKENDS = ("json", "journal", "sqlite")
 DEFAULT_COLORS = {
     "default_color": "#A0A0A0",
     "toggle_done_color_project_tree": "#90EE90",
@@ -15,7 +16,11 @@ DEFAULT_COLORS = {
     "toggle_done_color_stat": "#90caf9",
     "tree_x_offset": 300,
     "tree_y_offset": 120,
-    "timeline_num_segments": 9
+    "timeline_num_segments": 9,
+    "unified_session_store": False,
+    "tree_backend": "json",
+    "lod_text_scale": 0.45,
+    "lod_edge_scale": 0.3
 }
 
 def load_settings():
@@ -89,7 +94,60 @@ class SettingsWidget(QWidget):
         timeline_layout.addWidget(timeline_label)
         timeline_layout.addWidget(self.timeline_spin)
         layout.addLayout(timeline_layout)
+
+        # 树状图细节层次：缩放比例低于阈值时节点不画文字 / 连线合并绘制（重启后生效）
+        self.lod_spins = {}
+        for key, label_text, default in [
+            ("lod_text_scale", "LOD Text Scale (低于此缩放不画文字):", 0.45),
+            ("lod_edge_scale", "LOD Edge Scale (低于此缩放合并连线):", 0.3),
+        ]:
+            lod_layout = QHBoxLayout()
+            lod_label = QLabel(label_text)
+            lod_label.setStyleSheet("font-family: '霞鹜文楷'; font-size: 20px;")
+            spin = QDoubleSpinBox()
+            spin.setStyleSheet("font-family: '霞鹜文楷'; font-size: 20px;")
+            spin.setRange(0.0, 2.0)
+            spin.setSingleStep(0.05)
+            spin.setValue(float(self.colors.get(key, default)))
+            spin.valueChanged.connect(lambda value, k=key: self.save_lod_scale(k, value))
+            lod_layout.addWidget(lod_label)
+            lod_layout.addWidget(spin)
+            layout.addLayout(lod_layout)
+            self.lod_spins[key] = spin
+
+        # 学习/复习统一存储（重启后生效，启动时与 learn.db / review.db 互相补齐缺少的记录）
+        self.unified_check = QCheckBox("Unified Session Store (统一存储，重启后生效)")
+        self.unified_check.setStyleSheet("font-family: '霞鹜文楷'; font-size: 20px;")
+        self.unified_check.setChecked(bool(self.colors.get("unified_session_store", False)))
+        self.unified_check.toggled.connect(self.save_unified_session_store)
+        layout.addWidget(self.unified_check)
+
+        # 项目树存储方式（重启后生效）：json 为整文件写回；journal 为追加式编辑日志，定期压缩为 data.json；
+        # sqlite 为 node 表，首次启用时从 data.json 导入，切换回其他方式时导出回 data.json
+        backend_layout = QHBoxLayout()
+        backend_label = QLabel("Tree Backend (树存储方式，重启后生效):")
+        backend_label.setStyleSheet("font-family: '霞鹜文楷'; font-size: 20px;")
+        self.tree_backend_combo = QComboBox()
+        self.tree_backend_combo.setStyleSheet("font-family: '霞鹜文楷'; font-size: 20px;")
+        self.tree_backend_combo.addItems(TREE_BACKENDS)
+        self.tree_backend_combo.setCurrentText(self.colors.get("tree_backend", "json"))
+        self.tree_backend_combo.currentTextChanged.connect(self.save_tree_backend)
+        backend_layout.addWidget(backend_label)
+        backend_layout.addWidget(self.tree_backend_combo)
+        layout.addLayout(backend_layout)
         self.setLayout(layout)
+    def save_unified_session_store(self, checked):
+        self.colors["unified_session_store"] = checked
+        save_settings(self.colors)
+
+    def save_lod_scale(self, key, value):
+        self.colors[key] = value
+        save_settings(self.colors)
+
+    def save_tree_backend(self, backend):
+        self.colors["tree_backend"] = backend
+        save_settings(self.colors)
+
     def save_timeline_num_segments(self):
         self.colors["timeline_num_segments"] = self.timeline_spin.value()
         save_settings(self.colors)
@@ -1,34 +1,16 @@
-import json, os, sys
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGraphicsView, QGraphicsScene, QMenu, QMessageBox, QLabel
+from PyQt5.QtWidgets import QVBoxLayout, QMenu, QMessageBox, QLabel
 from PyQt5.QtCore import Qt
-from tree_base import NodeItem, EdgeLine
+from tree_base import TreeView
 from settings import load_settings
-from PyQt5.QtGui import QPainter
 
 import matplotlib.pyplot as plt
+import numpy as np
 import datetime
-from collections import defaultdict
 import db
-
-def get_base_dir():
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)
-    else:
-        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-DATA_FILE = os.path.join(get_base_dir(), "data", "data.json")
-
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"name": "Root", "children": [], "pos": [0, 0], "done": False}
-
-def collect_ids(node):
-    ids = [node.get("id")]
-    for ch in node.get("children", []):
-        ids.extend(collect_ids(ch))
-    return ids
+import rollup
+import analytics
+import closure
+import tree_model
 
 def get_last_n_days(n):
     today = datetime.date.today()
@@ -52,72 +34,36 @@ def format_seconds(seconds):
     s = seconds % 60
     return f"{h}h {m}m {s}s"
 
-def node_learn_review_time(node):
-    ids = collect_ids(node)
-    learn = 0
-    review = 0
-    for node_id in ids:
-        for _, _, start, end in db.get_records(db.DB_LEARN, node_id):
-            learn += end - start
-        for _, _, start, end in db.get_records(db.DB_REVIEW, node_id):
-            review += end - start
+def learn_review_rollups(root):
+    # 学习/复习时长的增量汇总缓存，按 node_id O(1) 读取子树总时长
+    learn = rollup.get_rollup(db.DB_LEARN)
+    review = rollup.get_rollup(db.DB_REVIEW)
+    learn.ensure(root)
+    review.ensure(root)
     return learn, review
 
-class StatsWidget(QWidget):
+class StatsWidget(TreeView):
+    VIEW = "stats"
+
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
         self.settings = load_settings()
-        self.data = load_data()
+        self.model = tree_model.get_model()
+        self.data = self.model.root
         layout = QVBoxLayout(self)
-        self.scene = QGraphicsScene()
-        from tree_base import ZoomableGraphicsView
-        self.view = ZoomableGraphicsView(self.scene)
-        layout.addWidget(self.view)
+        self._init_scene(layout, antialiasing=False)
         self.info_label = QLabel()
         self.info_label.setStyleSheet("font-family: '霞鹜文楷'; font-size: 14px;")
         layout.addWidget(self.info_label)
-        self.node_items = []
-        self.selected_node = None
-        self.edges = []
         self.refresh()
         self.view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.view.customContextMenuRequested.connect(self.show_context_menu)
 
     def refresh(self):
-        self.data = load_data()
-    def refresh(self):
-        self.data = load_data()
-        self.scene.clear()
-        self.node_items = []
-        self.edges = []
-        x_offset = int(self.settings.get("tree_x_offset", 300))
-        y_offset = int(self.settings.get("tree_y_offset", 120))
-
-        # 递归布局算法（与project_tree一致）
-        leaf_positions = []
-        def assign_leaf_positions(node, depth=0):
-            if not node.get("children"):
-                node["_leaf_index"] = len(leaf_positions)
-                leaf_positions.append(node)
-            else:
-                for ch in node.get("children", []):
-                    assign_leaf_positions(ch, depth+1)
-
-        def set_positions(node, depth=0):
-            y = depth * y_offset
-            if not node.get("children"):
-                x = node["_leaf_index"] * x_offset
-                node["pos"] = [x, y]
-                return x
-            else:
-                child_xs = [set_positions(ch, depth+1) for ch in node["children"]]
-                x = sum(child_xs) / len(child_xs)
-                node["pos"] = [x, y]
-                return x
-
-        assign_leaf_positions(self.data)
-        set_positions(self.data)
+        self.data = self.model.root
+        lay = self.tree_layout()
+        positions = lay.positions
 
         def get_node_color(node):
             settings = self.settings
@@ -128,9 +74,10 @@ class StatsWidget(QWidget):
                 return node["color"]
             return settings.get("default_color", "#A0A0A0")
 
-        def draw_tree(node, parent_item=None):
+        def describe(node):
             color = get_node_color(node)
-            learn_sec, review_sec = node_learn_review_time(node)
+            learn_sec = learn_rollup.total(node.get("id"))
+            review_sec = review_rollup.total(node.get("id"))
             text = node["name"]
             # 如果已完成，显示完成时间
             if node.get("done"):
@@ -143,43 +90,36 @@ class StatsWidget(QWidget):
                         finished_str = f"Finished at {finished_time}"
                     text += f"\n{finished_str}"
             text += f'\n学:{format_seconds(learn_sec)}\n复:{format_seconds(review_sec)}'
-            item = NodeItem(node, color, text)
-            self.scene.addItem(item)
-            self.node_items.append(item)
-            if parent_item:
-                edge = EdgeLine(parent_item, item)
-                self.scene.addItem(edge)
-                self.edges.append(edge)
-            for ch in node.get("children", []):
-                draw_tree(ch, item)
-        draw_tree(self.data)
+            return color, text
+        def badge(node):
+            # 折叠节点的汇总：隐藏的后代数和子树学习 + 复习时长
+            total = learn_rollup.total(node.get("id")) + review_rollup.total(node.get("id"))
+            return f'+{lay.hidden_count(node["id"])} · {format_seconds(total)}'
+        learn_rollup, review_rollup = learn_review_rollups(self.data)
+        # 与场景中现有的图元比对，只更新变化的部分
+        self.scene_sync.sync(self.data, positions, describe, self.collapse.ids, badge)
+        self.layout_version = lay.version
         self.view.setSceneRect(self.scene.itemsBoundingRect().adjusted(-100, -100, 100, 100))
         self.show_total_time()
 
     def show_total_time(self):
-        ids = collect_ids(self.data)
-        learn = 0
-        review = 0
-        for node_id in ids:
-            for _, _, start, end in db.get_records(db.DB_LEARN, node_id):
-                learn += end - start
-            for _, _, start, end in db.get_records(db.DB_REVIEW, node_id):
-                review += end - start
+        learn_rollup, review_rollup = learn_review_rollups(self.data)
+        learn = learn_rollup.total(self.data.get("id"))
+        review = review_rollup.total(self.data.get("id"))
         self.info_label.setText(f"TOTALLEARN: {format_seconds(learn)}    TOTALREVIEW: {format_seconds(review)}")
 
-    def get_selected(self):
-        if not self.selected_node:
-            return None, None
-        def find_parent(data, target):
-            for ch in data.get("children", []):
-                if ch is target:
-                    return data
-                res = find_parent(ch, target)
-                if res:
-                    return res
-            return None
-        parent = find_parent(self.data, self.selected_node)
-        return self.selected_node, parent
+    def relayout(self):
+        diff = super().relayout()
+        if diff is not None:
+            # 场景范围只随新出现、移动的节点扩大，完整刷新时再收紧
+            moved, added, removed, _ = diff
+            rect = self.view.sceneRect()
+            for node_id in moved | added:
+                rect = rect.united(self.items[node_id].sceneBoundingRect().adjusted(-100, -100, 100, 100))
+            self.view.setSceneRect(rect)
+            if removed:
+                self.show_total_time()
+        return diff
 
     def show_chart(self):
         node, _ = self.get_selected()
@@ -187,36 +127,27 @@ class StatsWidget(QWidget):
             QMessageBox.warning(self, "Tip", "Please select a node")
             return
 
-        ids = collect_ids(node)
-        learn_by_date = defaultdict(int)
-        review_by_date = defaultdict(int)
-        for node_id in ids:
-            for _, date, start, end in db.get_records(db.DB_LEARN, node_id):
-                learn_by_date[date] += end - start
-            for _, date, start, end in db.get_records(db.DB_REVIEW, node_id):
-                review_by_date[date] += end - start
+        # 先序编号后一次载入 daily 汇总数组，折线图向量化计算
+        _, index, _ = analytics.index_tree(node)
+        today = db.date_to_day(datetime.date.today())
+        year_months = get_last_n_months(12)
+        month_starts = np.array([db.date_to_day(m + "-01") for m in year_months])
+        daily = db.load_daily_arrays(index, first_day=min(int(month_starts[0]), today - 364))
+        is_learn = daily["kind"] == analytics.LEARN
+        learn_day, learn_sec = daily["day"][is_learn], daily["seconds"][is_learn]
+        review_day, review_sec = daily["day"][~is_learn], daily["seconds"][~is_learn]
 
         week_dates = get_last_n_days(7)
-        week_learn = [learn_by_date.get(d, 0) for d in week_dates]
-        week_review = [review_by_date.get(d, 0) for d in week_dates]
+        week_learn = analytics.per_day_seconds(learn_day, learn_sec, today - 6, 7)
+        week_review = analytics.per_day_seconds(review_day, review_sec, today - 6, 7)
 
         month_dates = get_last_n_days(30)
-        month_learn = [learn_by_date.get(d, 0) for d in month_dates]
-        month_review = [review_by_date.get(d, 0) for d in month_dates]
+        month_learn = analytics.per_day_seconds(learn_day, learn_sec, today - 29, 30)
+        month_review = analytics.per_day_seconds(review_day, review_sec, today - 29, 30)
 
-        year_months = get_last_n_months(12)
-        learn_month_agg = defaultdict(int)
-        review_month_agg = defaultdict(int)
-        for d, v in learn_by_date.items():
-            ym = d[:7]
-            learn_month_agg[ym] += v
-        for d, v in review_by_date.items():
-            ym = d[:7]
-            review_month_agg[ym] += v
-        year_learn = [learn_month_agg.get(m, 0) for m in year_months]
-        year_review = [review_month_agg.get(m, 0) for m in year_months]
+        year_learn = analytics.per_month_seconds(learn_day, learn_sec, month_starts)
+        year_review = analytics.per_month_seconds(review_day, review_sec, month_starts)
 
-        import numpy as np
         fig, axs = plt.subplots(2, 4, figsize=(24, 10))
         # 1. 折线图1：最近7天
         ax = axs[0, 0]
@@ -251,6 +182,12 @@ class StatsWidget(QWidget):
         # 4. 空白子图
         axs[0, 3].axis('off')
 
+        # 四个饼图所需的各直接子节点子树学习时长：闭包表上一次 JOIN + GROUP BY 取全部窗口
+        pie_days = (1, 7, 30, 365)
+        pie_totals = closure.subtree_seconds(
+            self.data, ancestors=[ch["id"] for ch in node.get("children", [])],
+            since_days=[today - (days - 1) for days in pie_days], kinds=("learn",))["learn"]
+
         # 饼图绘制函数
         def plot_percent_pie(ax, node, days, title):
             # 只统计直接子节点
@@ -258,18 +195,11 @@ class StatsWidget(QWidget):
                 ax.set_title(title + " (No Data)")
                 ax.axis('off')
                 return
-            end_date = datetime.date.today()
-            start_date = end_date - datetime.timedelta(days=days-1)
+            col = pie_days.index(days)
             child_names = []
             child_times = []
             for ch in node["children"]:
-                ids = collect_ids(ch)
-                total = 0
-                for node_id in ids:
-                    for _, date, start, end in db.get_records(db.DB_LEARN, node_id):
-                        d = datetime.datetime.strptime(date, "%Y-%m-%d").date()
-                        if start_date <= d <= end_date:
-                            total += end - start
+                total = pie_totals.get(ch["id"], [0] * len(pie_days))[col]
                 if total > 0:  # 只添加时长大于0的
                     child_names.append(ch["name"])
                     child_times.append(total)
@@ -295,18 +225,17 @@ class StatsWidget(QWidget):
         plt.show()
 
     def show_context_menu(self, pos):
-        view_pos = self.view.mapToScene(pos)
-        clicked_item = None
-        for item in self.node_items:
-            if item.contains(item.mapFromScene(view_pos)):
-                clicked_item = item
-                break
+        clicked_item = self.scene_sync.node_at(self.view.mapToScene(pos))
         if not clicked_item:
             return
-        self.selected_node = clicked_item.node_data
+        self.selection.select(clicked_item.node_data["id"])
         menu = QMenu(self)
         # Show Chart 作为主菜单第一个选项
         menu.addAction("Show Chart", self.show_chart)
+        # 有子节点时可折叠 / 展开
+        if clicked_item.node_data.get("children"):
+            collapsed = clicked_item.node_data["id"] in self.collapse.ids
+            menu.addAction("Expand" if collapsed else "Collapse", self.toggle_collapse)
         # Color 子菜单
         color_menu = menu.addMenu("Color")
         color_menu.addAction("Change Color", self.change_node_color)
@@ -315,23 +244,19 @@ class StatsWidget(QWidget):
         menu.exec_(global_pos)
 
     def set_node_default_color(self):
-        node = self.selected_node
+        node, _ = self.get_selected()
         if node is None:
             return
         if "color" in node:
-            del node["color"]
-            from project_tree import save_data
-            save_data(self.data)
-            self.refresh()
+            self.model.update(node["id"], unset=["color"])
+            self.main_window.update_node(node["id"])
 
     def change_node_color(self):
-        node = self.selected_node
+        node, _ = self.get_selected()
         if node is None:
             return
         from PyQt5.QtWidgets import QColorDialog
         color = QColorDialog.getColor()
         if color.isValid():
-            node["color"] = color.name()
-            from project_tree import save_data
-            save_data(self.data)
-            self.refresh()
\ No newline at end of file
+            self.model.update(node["id"], color=color.name())
+            self.main_window.update_node(node["id"])
\ No newline at end of file
@@ -19,36 +19,16 @@ def get_last_n_days(n):
     today = datetime.date.today()
     return [(today - datetime.timedelta(days=i)).strftime("%Y-%m-%d") for i in reversed(range(n))]
 
-def get_project_tasks():
-    # 从数据库收集所有学习/复习记录，按项目分组
-    from project_tree import load_data
-    data = load_data()
-    node_id_name = {}
-    def collect(node):
-        node_id_name[node.get("id")] = node.get("name", "")
-        for ch in node.get("children", []):
-            collect(ch)
-    collect(data)
-    # 收集所有学习/复习记录
-    tasks = []
-    for node_id, name in node_id_name.items():
-        for _, date, start, end in db.get_records(db.DB_LEARN, node_id):
-            tasks.append({
-                "Task": name,
-                "Type": "Learn",
-                "Start": datetime.datetime.fromtimestamp(start),
-                "Finish": datetime.datetime.fromtimestamp(end),
-                "Date": date
-            })
-        for _, date, start, end in db.get_records(db.DB_REVIEW, node_id):
-            tasks.append({
-                "Task": name,
-                "Type": "Review",
-                "Start": datetime.datetime.fromtimestamp(start),
-                "Finish": datetime.datetime.fromtimestamp(end),
-                "Date": date
-            })
-    return tasks
+def get_project_tasks(start=None, end=None):
+    # 流式读取 [start, end) 时间窗口内的学习/复习记录，逐条产出 (名称, 类型, 开始, 结束)
+    # 开始/结束保持 epoch 秒，只有真正绘制的区间才转换为 datetime
+    import tree_model
+    node_id_name = {node_id: node.get("name", "") for node_id, node in tree_model.get_model().by_id.items()}
+    kind_label = {"learn": "Learn", "review": "Review"}
+    for kind, node_id, s, e in db.iter_sessions(columns=("node_id", "start", "end"), start=start, end=end):
+        name = node_id_name.get(node_id)
+        if name is not None:
+            yield name, kind_label[kind], s, e
 
 class TimelinePlotlyWidget(QWidget):
     def __init__(self, main_window, num_segments=None):
@@ -113,18 +93,6 @@ class TimelinePlotlyWidget(QWidget):
         QTimer.singleShot(300, scroll_to_bottom)
 
     def show_timeline(self, layout):
-        tasks = get_project_tasks()
-        if not tasks:
-            from PyQt5.QtWidgets import QLabel
-            layout.addWidget(QLabel("No data to show."))
-            return
-        import pandas as pd
-        df = pd.DataFrame(tasks)
-        df = df[df["Task"] != "Root"]
-        if df.empty:
-            from PyQt5.QtWidgets import QLabel
-            layout.addWidget(QLabel("No data to show."))
-            return
         import plotly.graph_objects as go
         type_color = {"Learn": "#4F81BD", "Review": "#C0504D"}
         # 计算当前时间属于哪个8小时段
@@ -152,6 +120,21 @@ class TimelinePlotlyWidget(QWidget):
                 continue
             segments.append((seg_start, seg_end))
         segments = segments[::-1]
+        # 只加载所有时间段覆盖范围内的记录
+        window_start = segments[0][0].timestamp() if segments else None
+        window_end = segments[-1][1].timestamp() if segments else None
+        import pandas as pd
+        df = pd.DataFrame.from_records(
+            get_project_tasks(window_start, window_end),
+            columns=["Task", "Type", "Start", "Finish"]
+        )
+        df = df[df["Task"] != "Root"]
+        # 窗口内没有记录时仍画出空的时间段轴；只有全部历史中都没有记录才显示提示
+        # （流式读取，遇到第一条非 Root 记录即停止）
+        if df.empty and not any(name != "Root" for name, _, _, _ in get_project_tasks()):
+            from PyQt5.QtWidgets import QLabel
+            layout.addWidget(QLabel("No data to show."))
+            return
         from PyQt5.QtCore import QUrl
         webviews = []
         # 新建 timeline_html 文件夹
@@ -161,7 +144,7 @@ class TimelinePlotlyWidget(QWidget):
         for idx, (seg_start, seg_end) in enumerate(segments):
             if seg_start >= seg_end:
                 continue
-            mask = (df["Start"] >= seg_start) & (df["Start"] < seg_end)
+            mask = (df["Start"] >= seg_start.timestamp()) & (df["Start"] < seg_end.timestamp())
             df_seg = df[mask]
             fig = go.Figure()
             # 主轴线用go.Scatter绘制，横坐标用datetime，彻底消除NaN
@@ -176,8 +159,8 @@ class TimelinePlotlyWidget(QWidget):
             intervals = []
             for _, row in df_seg.iterrows():
                 intervals.append({
-                    "start": row["Start"],
-                    "end": row["Finish"],
+                    "start": datetime.datetime.fromtimestamp(row["Start"]),
+                    "end": datetime.datetime.fromtimestamp(row["Finish"]),
                     "task": row["Task"],
                     "type": row["Type"]
                 })
@@ -1,35 +1,14 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QMessageBox, QSizePolicy, QSpacerItem
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
 import time
 import datetime
-import json
-import project_tree
 import db
-import os
-import sys
-
-def get_base_dir():
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)
-    else:
-        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-DATA_FILE = os.path.join(get_base_dir(), "data", "data.json")
-
-def save_data(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def find_and_update_lastreview_by_id(node, target_id, ts):
-    if node.get("id") == target_id:
-        node["lastreview"] = ts
-        return True
-    for ch in node.get("children", []):
-        if find_and_update_lastreview_by_id(ch, target_id, ts):
-            return True
-    return False
+import tree_model
 
 class TimerWidget(QWidget):
+    # 后台写入完成后由写入线程发出，参数为 (dbfile, rows, 异常或 None)
+    session_saved = pyqtSignal(str, object, object)
+
     def __init__(self, main_window=None):
         super().__init__()
         self.main_window = main_window
@@ -77,10 +56,12 @@ class TimerWidget(QWidget):
         self.intervals = []
         self.current_node = None
         self.mode = None  # "learn" or "review"
+        self.pending = []  # 写入失败、等待重试的 (dbfile, rows)
 
         self.btn_start.clicked.connect(self.start)
         self.btn_pause.clicked.connect(self.pause)
         self.btn_end.clicked.connect(self.end)
+        self.session_saved.connect(self.on_session_saved)
 
         # 状态标签
         self.status_label = QLabel("Stopped")
@@ -140,17 +121,15 @@ class TimerWidget(QWidget):
             node_id = self.current_node.get("id")
             date = datetime.datetime.now().strftime("%Y-%m-%d")
             dbfile = db.DB_LEARN if self.mode == "learn" else db.DB_REVIEW
-            for s, e in self.intervals:
-                if e:
-                    db.add_record(dbfile, node_id, date, int(s), int(e))
-            # 复习后自动更新 lastreview
+            rows = [(node_id, date, int(s), int(e)) for s, e in self.intervals if e]
+            # 复习后自动更新 lastreview：共享模型按 id 更新，data.json 由 persistence 合并写入
             if self.mode == "review":
-                data = project_tree.load_data()
-                ts = int(time.time())
-                find_and_update_lastreview_by_id(data, node_id, ts)
-                save_data(data)
-        if self.main_window:
+                tree_model.get_model().update(node_id, lastreview=int(time.time()))
+            # 区间交给后台线程一次事务写盘，写完后再刷新各页面
+            self.save_records(dbfile, rows)
+        elif self.main_window:
             self.main_window.refresh_all()
+        if self.main_window:
             # timer结束后自动返回之前的页面
             self.main_window.return_from_timer()
         self.label.setText("00:00:00")
@@ -161,6 +140,29 @@ class TimerWidget(QWidget):
         self.mode = None
         self.set_status("Stopped")
 
+    def save_records(self, dbfile, rows):
+        # 先重试此前写入失败的记录，再写本次的
+        self.flush()
+        self._submit(dbfile, rows)
+
+    def _submit(self, dbfile, rows):
+        db.writer.submit(db.add_records, dbfile, rows,
+                         callback=lambda error: self.session_saved.emit(dbfile, rows, error))
+
+    def flush(self):
+        """重新提交写入失败的记录；退出时由 db.close_all 等待完成。"""
+        pending, self.pending = self.pending, []
+        for dbfile, rows in pending:
+            self._submit(dbfile, rows)
+
+    def on_session_saved(self, dbfile, rows, error):
+        if error is not None:
+            # 记录留在内存中，下次结束计时或退出程序时重试
+            self.pending.append((dbfile, rows))
+            QMessageBox.warning(self, "Save Failed", f"保存计时记录失败：{error}\n记录已保留，将在下次结束计时或退出时重试。")
+        if self.main_window:
+            self.main_window.refresh_all()
+
     def update_time(self):
         if not self.start_time:
             return
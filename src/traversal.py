@@ -0,0 +1,58 @@
+"""
+项目树的迭代遍历工具。
+
+全部使用显式栈，不受 Python 递归深度限制，很深的大纲（上万层）也能遍历；
+收集结果时逐个追加，不做逐层列表拼接。节点为 data.json 中的字典，
+子节点在 "children" 中。collapsed 为折叠节点 id 的集合，遍历不进入其子树
+（折叠节点本身仍会产出）。
+"""
+
+def preorder(root, collapsed=()):
+    """先序遍历，按从左到右的顺序产出 (node, parent, depth)。"""
+    # 栈中保存各层子节点的迭代器，宽树的兄弟节点不逐个入栈
+    yield root, None, 0
+    if root.get("id") in collapsed:
+        return
+    stack = [(root, iter(root.get("children") or ()), 1)]
+    while stack:
+        parent, it, depth = stack[-1]
+        for node in it:
+            yield node, parent, depth
+            children = node.get("children")
+            if children and node.get("id") not in collapsed:
+                stack.append((node, iter(children), depth + 1))
+                break
+        else:
+            stack.pop()
+
+def postorder(root, collapsed=()):
+    """后序遍历，子节点全部产出后才产出父节点，产出 (node, parent, depth)。"""
+    children = root.get("children") if root.get("id") not in collapsed else None
+    stack = [(root, None, 0, iter(children or ()))]
+    while stack:
+        node, parent, depth, it = stack[-1]
+        for ch in it:
+            children = ch.get("children")
+            if children and ch.get("id") not in collapsed:
+                stack.append((ch, node, depth + 1, iter(children)))
+                break
+            yield ch, node, depth + 1
+        else:
+            stack.pop()
+            yield node, parent, depth
+
+def iter_nodes(root, collapsed=()):
+    """子树中的全部节点（先序）。"""
+    for node, _, _ in preorder(root, collapsed):
+        yield node
+
+def subtree_ids(node):
+    """node 子树（含自身）所有节点 id 的集合。"""
+    return {n.get("id") for n, _, _ in preorder(node)}
+
+def parent_map(root, parent_id=None):
+    """{node_id: parent_id}，root 的父节点记为 parent_id。"""
+    parents = {}
+    for node, parent, _ in preorder(root):
+        parents[node.get("id")] = parent.get("id") if parent is not None else parent_id
+    return parents
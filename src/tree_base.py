@@ -1,40 +1,109 @@
-from PyQt5.QtWidgets import QGraphicsRectItem, QGraphicsTextItem, QGraphicsLineItem, QGraphicsView
-from PyQt5.QtGui import QBrush, QColor, QPen, QFont
-from PyQt5.QtCore import Qt, QPointF
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsRectItem, QGraphicsLineItem, QGraphicsPathItem, QGraphicsScene, QGraphicsView, QWidget
+from PyQt5.QtGui import QBrush, QColor, QPen, QFont, QFontMetricsF, QPainter, QPainterPath
+from PyQt5.QtCore import Qt, QPointF, QRectF
+import collapse
+import layout
+import selection
+import traversal
+
+# 细节层次阈值（视图缩放比例），可在 settings.json 中按 lod_text_scale / lod_edge_scale 覆盖
+LOD_TEXT_SCALE = 0.45   # 低于此比例时节点只画纯色矩形，不画文字和边框
+LOD_EDGE_SCALE = 0.3    # 低于此比例时连线改用 1 像素细线、不抗锯齿
+
+_node_font = None
+_text_sizes = {}          # {(text, font.key()): (width, height)}
+TEXT_CACHE_SIZE = 20000   # 超过后整体清空，避免计时文字不断变化时无限增长
+
+def node_font():
+    # 延迟创建：QFont 需要在 QApplication 之后构造
+    global _node_font
+    if _node_font is None:
+        _node_font = QFont("霞鹜文楷")
+        _node_font.setPointSize(10)
+        _node_font.setBold(True)
+    return _node_font
+
+def text_size(text, font):
+    """多行文字的 (宽, 高)，按 (text, font) 缓存 QFontMetricsF 的测量结果。"""
+    key = (text, font.key())
+    size = _text_sizes.get(key)
+    if size is None:
+        if len(_text_sizes) >= TEXT_CACHE_SIZE:
+            _text_sizes.clear()
+        rect = QFontMetricsF(font).boundingRect(QRectF(0, 0, 1e6, 1e6), Qt.AlignLeft, text)
+        size = _text_sizes[key] = (rect.width(), rect.height())
+    return size
 
 class NodeItem(QGraphicsRectItem):
-    PADDING = 16
-
-    def __init__(self, node_data, color, text, parent=None):
-        x, y = node_data.get("pos", [0, 0])
-        font = QFont("霞鹜文楷")
-        font.setPointSize(10)
-        font.setBold(True)
-        temp_text = QGraphicsTextItem(text)
-        temp_text.setFont(font)
-        rect = temp_text.boundingRect()
-        width = rect.width() + self.PADDING
-        height = rect.height() + self.PADDING
-        super().__init__(-width/2, -height/2, width, height)
-        self.setPos(x, y)
-        self.setBrush(QBrush(QColor(color)))
+    PADDING = 24   # 与原先 QGraphicsTextItem 的文档边距（4px * 2）加 16px 内边距一致
+    BADGE_MARGIN = 6   # 折叠徽标的左右内边距及与文字的间距
+
+    def __init__(self, node_data, color, text, pos=(0, 0), parent=None, badge=None):
+        super().__init__()
         self.setPen(QPen(Qt.black, 2))
         self.setZValue(1)
         self.setFlag(QGraphicsRectItem.ItemIsSelectable, True)
         self.setFlag(QGraphicsRectItem.ItemIsMovable, True)
         self.setFlag(QGraphicsRectItem.ItemSendsGeometryChanges, True)
+        # 按设备坐标缓存绘制结果，平移时直接贴图；缩放时 Qt 自动重新生成
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         self.node_data = node_data
+        self.color = None
+        self.label = None
+        self.badge = None        # 折叠节点的汇总徽标文字
+        self.edges = []          # 拖动中实时更新的 EdgeLine
+        self.scene_sync = None   # 所属的 SceneSync，拖动开始 / 结束时通知
+        self.pressed = False     # 左键按下、尚未松开；真正移动后才开始拖动
+        self.set_content(color, text, badge)
+        self.setPos(*pos)
 
-        # 文字居中
-        self.text = QGraphicsTextItem(text, self)
-        self.text.setFont(font)
-        self.text.setDefaultTextColor(Qt.black)
-        text_rect = self.text.boundingRect()
-        self.text.setPos(
-            (self.rect().width() - text_rect.width()) / 2 - self.rect().width()/2,
-            (self.rect().height() - text_rect.height()) / 2 - self.rect().height()/2
-        )
-        self.edges = []
+    def set_content(self, color, text, badge=None):
+        """更新颜色、文字和徽标，与当前内容相同时不做任何事。"""
+        if color != self.color:
+            self.color = color
+            self.setBrush(QBrush(QColor(color)))
+        if text != self.label or badge != self.badge:
+            self.label = text
+            self.badge = badge
+            # 按文字大小调整矩形，文字在 paint 中居中绘制，徽标在文字下方
+            width, height = text_size(text, node_font())
+            if badge:
+                badge_width, badge_height = text_size(badge, node_font())
+                width = max(width, badge_width + 2 * self.BADGE_MARGIN)
+                height += badge_height + self.BADGE_MARGIN
+            width += self.PADDING
+            height += self.PADDING
+            self.setRect(-width/2, -height/2, width, height)
+            self.update()
+
+    def paint(self, painter, option, widget=None):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < _view_setting(widget, "lod_text_scale", LOD_TEXT_SCALE):
+            # 缩得很小时文字不可读，只画纯色矩形；选中的节点仍画虚线框，
+            # 用不随缩放变细的画笔，远景下也能看出选中了哪个节点
+            painter.fillRect(self.rect(), self.brush())
+            if self.isSelected():
+                pen = QPen(Qt.black, 2, Qt.DashLine)
+                pen.setCosmetic(True)
+                painter.setPen(pen)
+                painter.setBrush(Qt.NoBrush)
+                painter.drawRect(self.rect())
+            return
+        super().paint(painter, option, widget)
+        painter.setFont(node_font())
+        rect = self.rect()
+        if self.badge:
+            badge_width, badge_height = text_size(self.badge, node_font())
+            badge_rect = QRectF(-badge_width/2 - self.BADGE_MARGIN, rect.bottom() - self.PADDING/2 - badge_height,
+                                badge_width + 2 * self.BADGE_MARGIN, badge_height)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 50))
+            painter.drawRoundedRect(badge_rect, badge_height/2, badge_height/2)
+            painter.setPen(Qt.black)
+            painter.drawText(badge_rect, Qt.AlignCenter, self.badge)
+            rect = rect.adjusted(0, 0, 0, -(badge_height + self.BADGE_MARGIN))
+        painter.setPen(Qt.black)
+        painter.drawText(rect, Qt.AlignCenter, self.label)
 
     def center(self):
         # 返回场景坐标下的中心点
@@ -44,11 +113,29 @@ class NodeItem(QGraphicsRectItem):
         self.edges.append(edge)
 
     def itemChange(self, change, value):
-        if change == QGraphicsRectItem.ItemPositionChange:
+        if change == QGraphicsRectItem.ItemPositionHasChanged:
+            if self.pressed and self.scene_sync is not None and not self.scene_sync.dragging:
+                # 按下后第一次真正移动时才把相连的连线换成实时连线；
+                # 单击不移动时不触碰连线路径。选中的节点会一起被拖动
+                dragged = [item for item in self.scene().selectedItems() if isinstance(item, NodeItem)]
+                self.scene_sync.begin_drag(dragged or [self])
+            # 位置生效后再更新连线，端点取到的是新位置
             for edge in self.edges:
                 edge.update_position()
         return super().itemChange(change, value)
 
+    def mousePressEvent(self, event):
+        super().mousePressEvent(event)
+        if event.button() == Qt.LeftButton:
+            self.pressed = True
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if event.button() == Qt.LeftButton:
+            self.pressed = False
+            if self.scene_sync is not None and self.scene_sync.dragging:
+                self.scene_sync.end_drag()
+
 class EdgeLine(QGraphicsLineItem):
     def __init__(self, node1, node2):
         super().__init__()
@@ -59,16 +146,248 @@ class EdgeLine(QGraphicsLineItem):
         self.node2.add_edge(self)
         self.update_position()
 
+    def detach(self):
+        # 从两端节点的连线列表中移除
+        for node in (self.node1, self.node2):
+            if self in node.edges:
+                node.edges.remove(self)
+
     def update_position(self):
         p1 = self.node1.center()
         p2 = self.node2.center()
         self.setLine(p1.x(), p1.y(), p2.x(), p2.y())
 
+def _view_setting(widget, name, default):
+    # widget 为视图的 viewport，阈值保存在 ZoomableGraphicsView 上
+    view = widget.parent() if widget is not None else None
+    return getattr(view, name, default)
+
+class EdgeLayer(QGraphicsPathItem):
+    """全部静态连线合并成的一条路径，整个场景只有这一个连线图元。"""
+    def __init__(self):
+        super().__init__()
+        self.setPen(QPen(Qt.gray, 2))
+        self.thin_pen = QPen(Qt.gray, 1)
+        self.thin_pen.setCosmetic(True)   # 缩小时保持 1 像素宽
+        self.setZValue(0)
+
+    def rebuild(self, lines):
+        """lines 为 (起点, 终点) 序列。"""
+        path = QPainterPath()
+        for p1, p2 in lines:
+            path.moveTo(p1)
+            path.lineTo(p2)
+        self.setPath(path)
+
+    def shape(self):
+        # 连线不参与点击检测：边界矩形覆盖整棵树，默认 shape() 每次都要描边整条路径
+        return QPainterPath()
+
+    def paint(self, painter, option, widget=None):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < _view_setting(widget, "lod_edge_scale", LOD_EDGE_SCALE):
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.setPen(self.thin_pen)
+        else:
+            painter.setPen(self.pen())
+        painter.drawPath(self.path())
+
+class SceneSync:
+    """按 node_id 维护场景中的 NodeItem，连线由一个 EdgeLayer 统一绘制。
+
+    每次刷新把模型与现有图元比对：颜色、文字、位置原地更新，只为新增 / 删除的节点
+    创建或移除图元，不再 scene.clear() 后全部重建。连线路径只在布局变化时重建；
+    拖动节点时，只有与被拖动节点相连的连线临时改为 EdgeLine 实时跟随。
+    场景中的选中与三个视图共用的 selection 双向同步，按 node_id 保持，刷新后不丢失。
+    """
+    def __init__(self, scene):
+        self.scene = scene
+        self.selection = selection.get_selection()
+        self.selection.add_listener(self.show_selection)
+        self.scene.selectionChanged.connect(self._scene_selection_changed)
+        self._showing = False   # show_selection 修改场景选中期间，不回写 selection
+        self.items = {}      # {node_id: NodeItem}
+        self.parent = {}     # {node_id: parent_id}，根节点为 None
+        self.children = {}   # {node_id: {child_id}}
+        self.edge_layer = EdgeLayer()
+        self.scene.addItem(self.edge_layer)
+        self.dragging = set()   # 正在拖动的 node_id
+        self.live_edges = []    # 拖动中的 EdgeLine
+        self.describe = None    # 以下三项记录上次 sync 的参数
+        self.collapsed = ()
+        self.badge = None
+
+    def sync(self, root, positions, describe, collapsed=(), badge=None):
+        """describe(node) 返回 (color, text)，positions 为 {node_id: [x, y]}。
+
+        collapsed 中的节点不为子树创建图元，有子节点时显示 badge(node) 返回的徽标。
+        三个参数留给 apply_diff / update_item 逐个生成图元内容。
+        """
+        # 有节点增删、移动或换父节点（或打断了拖动）时才重建连线路径
+        edges_changed = bool(self.dragging)
+        self.end_drag(rebuild=False)
+        self.describe = describe
+        self.collapsed = collapsed
+        self.badge = badge
+        old_parent = self.parent
+        self.parent = {}
+        self.children = {}
+        for node, parent, _ in traversal.preorder(root, collapsed):
+            node_id = node["id"]
+            x, y = positions[node_id]
+            item = self.items.get(node_id)
+            if item is None:
+                self._add_item(node, (x, y))
+                edges_changed = True
+            else:
+                item.node_data = node
+                item.set_content(*self._content(node))
+                if item.x() != x or item.y() != y:
+                    item.setPos(x, y)
+                    edges_changed = True
+            parent_id = parent["id"] if parent is not None else None
+            if old_parent.get(node_id) != parent_id:
+                edges_changed = True
+            self.parent[node_id] = parent_id
+            if parent_id is not None:
+                self.children.setdefault(parent_id, set()).add(node_id)
+        for node_id in [n for n in self.items if n not in self.parent]:
+            self.scene.removeItem(self.items.pop(node_id))
+            edges_changed = True
+        if edges_changed:
+            self.rebuild_edges()
+
+    def _content(self, node):
+        # (color, text, badge)，徽标只给有子节点的折叠节点
+        color, text = self.describe(node)
+        node_badge = None
+        if self.badge is not None and node["id"] in self.collapsed and node.get("children"):
+            node_badge = self.badge(node)
+        return color, text, node_badge
+
+    def _add_item(self, node, pos):
+        color, text, node_badge = self._content(node)
+        item = self.items[node["id"]] = NodeItem(node, color, text, pos, badge=node_badge)
+        item.scene_sync = self
+        self.scene.addItem(item)
+        if node["id"] == self.selection.node_id:
+            item.setSelected(True)
+        return item
+
+    def apply_diff(self, model, positions, diff):
+        """按 layout.changed_since 返回的 (moved, added, removed, restyled) 只处理受影响的图元。
+
+        须在 sync 之后调用；连线路径只在有节点移动、增删时重建。
+        """
+        moved, added, removed, restyled = diff
+        edges_changed = bool(moved or added or removed or self.dragging)
+        self.end_drag(rebuild=False)
+        for node_id in removed:
+            self.scene.removeItem(self.items.pop(node_id))
+            parent_id = self.parent.pop(node_id)
+            if parent_id in self.children:
+                self.children[parent_id].discard(node_id)
+            self.children.pop(node_id, None)
+        for node_id in added:
+            self._add_item(model.get(node_id), positions[node_id])
+        for node_id in moved:
+            self.items[node_id].setPos(*positions[node_id])
+        # 新出现和移动的节点可能换了父节点
+        for node_id in added | moved:
+            parent_id = model.parent.get(node_id)
+            old_parent_id = self.parent.get(node_id)
+            if old_parent_id != parent_id and old_parent_id in self.children:
+                self.children[old_parent_id].discard(node_id)
+            self.parent[node_id] = parent_id
+            if parent_id is not None:
+                self.children.setdefault(parent_id, set()).add(node_id)
+        for node_id in restyled - added:
+            self.update_item(model.get(node_id))
+        if edges_changed:
+            self.rebuild_edges()
+
+    def update_item(self, node):
+        """只重新生成一个节点的颜色、文字和徽标（改名、改颜色等），不可见时不做任何事。"""
+        item = self.items.get(node["id"])
+        if item is not None:
+            item.node_data = node
+            item.set_content(*self._content(node))
+
+    def node_at(self, scene_pos):
+        """scene_pos 处最上层的 NodeItem，没有时返回 None。
+
+        经场景的 BSP 索引查找，不逐个遍历图元。
+        """
+        for item in self.scene.items(scene_pos):
+            if isinstance(item, NodeItem):
+                return item
+        return None
+
+    def show_selection(self, node_id):
+        # selection 变化（可能来自其他视图）时更新本场景的选中
+        item = self.items.get(node_id)
+        if item is not None and item.isSelected() and len(self.scene.selectedItems()) == 1:
+            return
+        self._showing = True
+        try:
+            self.scene.clearSelection()
+            if item is not None:
+                item.setSelected(True)
+        finally:
+            self._showing = False
+
+    def _scene_selection_changed(self):
+        # 在场景中点选单个节点时写回 selection；框选多个节点（一起拖动）时保持不变
+        if self._showing:
+            return
+        selected = [item for item in self.scene.selectedItems() if isinstance(item, NodeItem)]
+        if len(selected) == 1:
+            self.selection.select(selected[0].node_data["id"])
+
+    def rebuild_edges(self):
+        items = self.items
+        dragging = self.dragging
+        self.edge_layer.rebuild(
+            (items[parent_id].pos(), items[node_id].pos())
+            for node_id, parent_id in self.parent.items()
+            if parent_id is not None and node_id not in dragging and parent_id not in dragging
+        )
+
+    def begin_drag(self, items):
+        # 与被拖动节点相连的连线从路径中移出，改为实时跟随的 EdgeLine
+        self.end_drag(rebuild=False)
+        self.dragging = {item.node_data["id"] for item in items if item.node_data["id"] in self.items}
+        pairs = set()
+        for node_id in self.dragging:
+            if self.parent.get(node_id) is not None:
+                pairs.add((self.parent[node_id], node_id))
+            for child_id in self.children.get(node_id, ()):
+                pairs.add((node_id, child_id))
+        for parent_id, node_id in pairs:
+            edge = EdgeLine(self.items[parent_id], self.items[node_id])
+            self.scene.addItem(edge)
+            self.live_edges.append(edge)
+        self.rebuild_edges()
+
+    def end_drag(self, rebuild=True):
+        if not self.dragging and not self.live_edges:
+            return
+        for edge in self.live_edges:
+            edge.detach()
+            self.scene.removeItem(edge)
+        self.live_edges = []
+        self.dragging = set()
+        if rebuild:
+            self.rebuild_edges()
+
 class ZoomableGraphicsView(QGraphicsView):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, lod_text_scale=LOD_TEXT_SCALE, lod_edge_scale=LOD_EDGE_SCALE, **kwargs):
         super().__init__(*args, **kwargs)
         self.setDragMode(QGraphicsView.ScrollHandDrag)
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        # NodeItem / EdgeLayer 绘制时按当前缩放比例与这两个阈值比较
+        self.lod_text_scale = lod_text_scale
+        self.lod_edge_scale = lod_edge_scale
 
     def wheelEvent(self, event):
         zoomInFactor = 1.15
@@ -76,4 +395,68 @@ class ZoomableGraphicsView(QGraphicsView):
         if event.angleDelta().y() > 0:
             self.scale(zoomInFactor, zoomInFactor)
         else:
-            self.scale(zoomOutFactor, zoomOutFactor)
\ No newline at end of file
+            self.scale(zoomOutFactor, zoomOutFactor)
+
+class TreeView(QWidget):
+    """项目树、复习、统计三个树状图的公共部分。
+
+    子类设置 VIEW（布局缓存和折叠状态按它区分），在 __init__ 中准备好 settings、model
+    后调用 _init_scene，并提供完整刷新 refresh()。
+    """
+    VIEW = None
+
+    def _init_scene(self, layout, antialiasing=True):
+        """创建场景和可缩放视图并加入 layout，初始化共用的选中、本视图的折叠状态和图元同步。"""
+        self.scene = QGraphicsScene()
+        self.view = ZoomableGraphicsView(
+            self.scene,
+            lod_text_scale=float(self.settings.get("lod_text_scale", LOD_TEXT_SCALE)),
+            lod_edge_scale=float(self.settings.get("lod_edge_scale", LOD_EDGE_SCALE)))
+        if antialiasing:
+            self.view.setRenderHint(QPainter.Antialiasing)
+        layout.addWidget(self.view)
+        self.selection = selection.get_selection()   # 三个视图共用，按 node_id 保存
+        self.collapse = collapse.get_state(self.VIEW)   # 本视图折叠的节点
+        self.scene_sync = SceneSync(self.scene)
+        self.items = self.scene_sync.items   # {node_id: NodeItem}
+        self.layout_version = None
+
+    def tree_layout(self):
+        # 按视图缓存的布局（各视图折叠状态不同），x_offset为叶子节点最小间距
+        x_offset = int(self.settings.get("tree_x_offset", 300))
+        y_offset = int(self.settings.get("tree_y_offset", 120))
+        return layout.get_layout(self.model, x_offset, y_offset, self.VIEW, self.collapse.ids)
+
+    def relayout(self):
+        """结构修改后按布局的变化记录只增删、移动、重绘受影响的图元，记录不足时退回完整刷新。
+
+        返回 changed_since 的 (moved, added, removed, restyled)，完整刷新时返回 None。
+        """
+        lay = self.tree_layout()
+        diff = lay.changed_since(self.layout_version)
+        if diff is None:
+            self.refresh()
+            return None
+        self.scene_sync.apply_diff(self.model, lay.positions, diff)
+        self.layout_version = lay.version
+        return diff
+
+    def update_node(self, node_id):
+        """节点名称、颜色、完成状态等修改后只更新它自己的图元。"""
+        node = self.model.get(node_id)
+        if node is not None:
+            self.scene_sync.update_item(node)
+
+    def get_selected(self):
+        node = self.selection.node()
+        if node is None:
+            return None, None
+        return node, self.model.parent_of(node["id"])
+
+    def toggle_collapse(self):
+        node, _ = self.get_selected()
+        if node is None or not node.get("children"):
+            return
+        self.collapse.toggle(node["id"])
+        self.tree_layout().build()
+        self.refresh()
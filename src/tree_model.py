@@ -0,0 +1,169 @@
+"""
+进程内共享的项目树模型。
+
+data.json 只解析一次，维护 id -> node 索引和父指针，按 id 查节点、父节点、
+路径都是 O(1) / O(深度)。所有对树的修改都通过 TreeModel.apply(op) 完成，
+op 为可 JSON 序列化的字典，修改后依次通知监听者 listener(op, node)：
+    {"op": "add", "parent": pid, "node": {...}, "index": i}
+    {"op": "remove", "id": nid}
+    {"op": "move", "id": nid, "parent": pid, "index": i}
+    {"op": "update", "id": nid, "set": {...}, "unset": [...]}
+"""
+import json, os, sys, uuid
+import traversal
+
+def get_base_dir():
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    else:
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_FILE = os.path.join(get_base_dir(), "data", "data.json")
+# 旧版本写入节点的布局字段，位置现在由 layout 模块单独缓存
+LAYOUT_KEYS = ("pos", "_leaf_index")
+
+def load_data(path=None):
+    path = path or DATA_FILE
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"name": "Root", "id": "root", "children": [], "done": False, "lastreview": 0, "review_state": False}
+
+def new_node(name):
+    # 新建节点的默认字段（不含 done_time）
+    return {
+        "name": name,
+        "id": str(uuid.uuid4()),
+        "children": [],
+        "done": False,
+        "lastreview": 0,
+        "review_state": False
+    }
+
+class TreeModel:
+    def __init__(self, root, listeners=None):
+        self.root = root
+        self.by_id = {}
+        self.parent = {}      # {node_id: parent_id}，根节点为 None
+        self.version = 0      # 结构变化（增、删、移动）时递增
+        self.listeners = listeners if listeners is not None else []
+        self.needs_save = self._reindex()  # 为 True 时需要写回（见 persistence）
+
+    def _reindex(self):
+        # 补齐缺失的 id、去掉旧版本写入的布局字段并建立索引，返回是否修改过节点
+        added = False
+        self.by_id.clear()
+        self.parent.clear()
+        # 先序遍历中父节点先于子节点产出，补上的 id 可以直接用作子节点的父指针
+        for node, parent, _ in traversal.preorder(self.root):
+            if "id" not in node:
+                node["id"] = str(uuid.uuid4())
+                added = True
+            for key in LAYOUT_KEYS:
+                if key in node:
+                    del node[key]
+                    added = True
+            self.by_id[node["id"]] = node
+            self.parent[node["id"]] = parent["id"] if parent is not None else None
+        return added
+
+    def _index_subtree(self, node, parent_id):
+        for n, parent, _ in traversal.preorder(node):
+            self.by_id[n["id"]] = n
+            self.parent[n["id"]] = parent["id"] if parent is not None else parent_id
+
+    def _unindex_subtree(self, node):
+        for n in traversal.iter_nodes(node):
+            self.by_id.pop(n["id"], None)
+            self.parent.pop(n["id"], None)
+
+    # ---- 查询 ----
+
+    def get(self, node_id):
+        return self.by_id.get(node_id)
+
+    def parent_of(self, node_id):
+        pid = self.parent.get(node_id)
+        return self.by_id.get(pid) if pid is not None else None
+
+    def path(self, node_id):
+        """从根到 node_id 的节点列表。"""
+        path = []
+        while node_id is not None:
+            path.append(self.by_id[node_id])
+            node_id = self.parent.get(node_id)
+        path.reverse()
+        return path
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # ---- 修改 ----
+
+    def apply(self, op):
+        kind = op["op"]
+        if kind == "add":
+            parent = self.by_id[op["parent"]]
+            node = op["node"]
+            children = parent.setdefault("children", [])
+            children.insert(op.get("index", len(children)), node)
+            self._index_subtree(node, parent["id"])
+            self.version += 1
+        elif kind == "remove":
+            node = self.by_id[op["id"]]
+            parent = self.parent_of(op["id"])
+            parent["children"] = [ch for ch in parent["children"] if ch is not node]
+            self._unindex_subtree(node)
+            self.version += 1
+        elif kind == "move":
+            node = self.by_id[op["id"]]
+            old_parent = self.parent_of(op["id"])
+            old_parent["children"].remove(node)
+            new_parent = self.by_id[op["parent"]]
+            children = new_parent.setdefault("children", [])
+            children.insert(op.get("index", len(children)), node)
+            self.parent[node["id"]] = new_parent["id"]
+            self.version += 1
+        elif kind == "update":
+            node = self.by_id[op["id"]]
+            node.update(op.get("set", {}))
+            for key in op.get("unset", []):
+                node.pop(key, None)
+        else:
+            raise ValueError(f"unknown tree op: {kind}")
+        for listener in self.listeners:
+            listener(op, node)
+
+    def add_child(self, parent_id, node, index=None):
+        op = {"op": "add", "parent": parent_id, "node": node}
+        if index is not None:
+            op["index"] = index
+        self.apply(op)
+
+    def remove(self, node_id):
+        self.apply({"op": "remove", "id": node_id})
+
+    def move(self, node_id, parent_id, index):
+        self.apply({"op": "move", "id": node_id, "parent": parent_id, "index": index})
+
+    def update(self, node_id, unset=(), **fields):
+        self.apply({"op": "update", "id": node_id, "set": fields, "unset": list(unset)})
+
+# 进程内唯一的模型，监听者可以在模型创建之前注册
+_model = None
+_listeners = []
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = TreeModel(load_data(), _listeners)
+    return _model
+
+def init_model(root):
+    """用其他存储后端（如 node_store）读出的树初始化共享模型。"""
+    global _model
+    _model = TreeModel(root, _listeners)
+    return _model
+
+def add_listener(listener):
+    _listeners.append(listener)
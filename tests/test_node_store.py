@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import db
+import node_store
+import tree_model
+
+def child_names(node):
+    return [ch["name"] for ch in node.get("children", [])]
+
+class NodeStoreOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "nodes.db")
+        self.store = node_store.NodeStore(self.path)
+        root = {"id": "root", "name": "Root", "children": [
+            {"id": name, "name": name, "children": []} for name in "abcdef"]}
+        self.store.import_json(root)
+        self.model = tree_model.TreeModel(self.store.load())
+        self.store.attach(self.model)
+
+    def tearDown(self):
+        db.close_all()
+        self.tmp.cleanup()
+
+    def reload(self):
+        # 等后台写入完成后重新从 nodes.db 读出
+        db.writer.stop()
+        return node_store.NodeStore(self.path).load()
+
+    def test_append_after_remove_keeps_order(self):
+        for node_id in "bde":
+            self.model.remove(node_id)
+        self.model.add_child("root", {"id": "g", "name": "g", "children": []})
+        self.assertEqual(child_names(self.model.root), list("acfg"))
+        self.assertEqual(child_names(self.reload()), list("acfg"))
+
+    def test_append_after_move_to_other_parent_keeps_order(self):
+        self.model.move("b", "a", 0)
+        self.model.move("c", "a", 1)
+        self.model.add_child("root", {"id": "g", "name": "g", "children": []})
+        root = self.reload()
+        self.assertEqual(child_names(root), list("adefg"))
+        self.assertEqual(child_names(root["children"][0]), list("bc"))
+
+if __name__ == "__main__":
+    unittest.main()